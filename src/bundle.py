@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import zipfile
+import argparse
+from concurrent.futures import as_completed
+
+from catalog import parse_entries
+from feed_cache import FeedCache, READ_SIZE
+from fetch_pool import shared_pool
+from image_cache import ImageCache
+from settings import load_settings
+
+APPIMAGE_IO_URL = "https://appimage.github.io/database"
+BUNDLE_FORMAT = "appstogo-catalog"
+BUNDLE_VERSION = 1
+
+
+def icon_url(entry):
+    """
+    Gets the url of the icon of a catalog entry.
+
+    :param entry: The CatalogEntry.
+    :return: The url, or None if the entry has no icon.
+    """
+    return APPIMAGE_IO_URL + "/" + entry.icon if entry.icon else None
+
+
+def screenshot_url(entry):
+    """
+    Gets the url of the screenshot of a catalog entry.
+
+    :param entry: The CatalogEntry.
+    :return: The url.
+    """
+    return APPIMAGE_IO_URL + "/" + entry.name + "/screenshot.png"
+
+
+class CatalogBundle:
+    """
+    An offline catalog bundle: a single zip file holding feed.json, the catalog
+    images and a versioned manifest mapping each image url to its member.
+    Members are read in place on demand, so a bundle can be used as the catalog
+    source straight from a USB stick without unpacking it.
+    """
+
+    def __init__(self, path) -> None:
+        """
+        Opens a catalog bundle.
+
+        :param path: The path of the bundle.
+        :raises ValueError: If the file is not a bundle this version can read.
+        """
+        self.path = path
+        try:
+            self.zip = zipfile.ZipFile(path)
+            self.manifest = json.loads(self.zip.read("manifest.json"))
+        except (zipfile.BadZipFile, KeyError, ValueError) as e:
+            raise ValueError(f"{path} is not a catalog bundle: {e}")
+        if (
+            self.manifest.get("format") != BUNDLE_FORMAT
+            or self.manifest.get("version", 0) > BUNDLE_VERSION
+        ):
+            self.zip.close()
+            raise ValueError(f"{path} is not a supported catalog bundle")
+        self.images = self.manifest.get("images", {})
+
+    def read_feed(self):
+        """
+        Reads the raw feed.json of the bundle.
+
+        :return: A generator of the byte chunks of the feed.
+        """
+        with self.zip.open("feed.json") as f:
+            yield from iter(lambda: f.read(READ_SIZE), b"")
+
+    def entries(self, on_chunk=None):
+        """
+        Parses the catalog of the bundle.
+
+        :param on_chunk: Called with the list of entries parsed so far.
+        :return: A list of CatalogEntry.
+        """
+        return parse_entries(self.read_feed(), on_chunk)
+
+    def read_image(self, url):
+        """
+        Reads an image of the bundle.
+
+        :param url: The url of the image.
+        :return: The bytes of the image, or None if it is not in the bundle.
+        """
+        member = self.images.get(url)
+        if member is None:
+            return None
+        return self.zip.read(member)
+
+    def close(self):
+        """
+        Closes the bundle.
+        """
+        self.zip.close()
+
+
+def export_bundle(path, screenshots=False):
+    """
+    Packs the catalog and its images into a bundle, downloading what is missing.
+
+    :param path: The path of the bundle to write.
+    :param screenshots: Also pack the screenshots.
+    :return: The number of entries and of images packed.
+    """
+    feed_cache = FeedCache()
+    entries = feed_cache.revalidate()
+    if entries is None:
+        entries = feed_cache.load()
+    if not entries:
+        raise ValueError("No catalog to export, the feed could not be fetched")
+
+    settings = load_settings()
+    image_cache = ImageCache(
+        max_bytes=settings["image_cache_max_bytes"],
+        max_age=settings["image_cache_max_age"],
+        negative_ttl=settings["image_negative_ttl"],
+    )
+    fetch_pool = shared_pool()
+
+    urls = [icon_url(entry) for entry in entries if entry.icon]
+    if screenshots:
+        urls += [screenshot_url(entry) for entry in entries]
+    futures = {
+        fetch_pool.submit(image_cache.fetch, url, fetch_pool): url for url in urls
+    }
+
+    images = {}
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w") as bundle:
+        bundle.write(
+            feed_cache.feed_file, "feed.json", compress_type=zipfile.ZIP_DEFLATED
+        )
+        # Images are written as they arrive and dropped, so that only the
+        # ones not written yet are held in memory
+        for future in as_completed(futures):
+            url = futures.pop(future)
+            try:
+                content = future.result()
+            except Exception as e:
+                print(f"Error fetching image: {e}")
+                continue
+            if content is None:
+                continue
+            member = "images/" + hashlib.sha256(url.encode()).hexdigest()
+            # Images are already compressed, they are stored as they are
+            bundle.writestr(member, content, compress_type=zipfile.ZIP_STORED)
+            images[url] = member
+
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "version": BUNDLE_VERSION,
+            "created": int(time.time()),
+            "entries": len(entries),
+            "images": images,
+        }
+        bundle.writestr("manifest.json", json.dumps(manifest))
+    os.replace(tmp_path, path)
+    return len(entries), len(images)
+
+
+def import_bundle(path):
+    """
+    Unpacks a bundle into the feed and image caches, so that the catalog
+    is available offline without keeping the bundle around.
+
+    :param path: The path of the bundle.
+    :return: The number of entries and of images imported.
+    """
+    bundle = CatalogBundle(path)
+    try:
+        entries = bundle.entries()
+        feed_cache = FeedCache()
+        os.makedirs(feed_cache.cache_dir, exist_ok=True)
+        tmp_path = feed_cache.feed_file + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in bundle.read_feed():
+                f.write(chunk)
+        os.replace(tmp_path, feed_cache.feed_file)
+        # Without validators the next online start fetches a fresh feed
+        feed_cache.write_atomic(feed_cache.meta_file, b"{}")
+
+        settings = load_settings()
+        image_cache = ImageCache(
+            max_bytes=settings["image_cache_max_bytes"],
+            max_age=settings["image_cache_max_age"],
+            negative_ttl=settings["image_negative_ttl"],
+        )
+        # Pinned images are kept apart from the size cap, which a bundle with
+        # screenshots can exceed, so that the import does not evict itself
+        for url in bundle.images:
+            image_cache.pin(url, bundle.read_image(url))
+        return len(entries), len(bundle.images)
+    finally:
+        bundle.close()
+
+
+def main(argv):
+    """
+    Runs the bundle command line.
+
+    :param argv: The arguments, without the program name.
+    :return: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="AppsToGo bundle",
+        description="Export or import an offline catalog bundle.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Pack the catalog in a bundle")
+    export_parser.add_argument("path", help="The bundle file to write")
+    export_parser.add_argument(
+        "--screenshots", action="store_true", help="Also pack the screenshots"
+    )
+    import_parser = commands.add_parser(
+        "import", help="Unpack a bundle into the local cache"
+    )
+    import_parser.add_argument("path", help="The bundle file to read")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            entries, images = export_bundle(args.path, args.screenshots)
+            print(f"Exported {entries} apps and {images} images to {args.path}")
+        else:
+            entries, images = import_bundle(args.path)
+            print(f"Imported {entries} apps and {images} images from {args.path}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
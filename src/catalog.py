@@ -0,0 +1,175 @@
+import sys
+
+from feed_parser import iter_items
+
+CHUNK_ITEMS = 200  # entries parsed between two early renders
+
+
+class CatalogEntry:
+    """
+    A compact record of one AppImage of the feed, holding only the fields the
+    download page shows. Repeated strings are interned, so that the categories,
+    licenses and authors shared by many entries are stored only once.
+    """
+
+    __slots__ = (
+        "name",
+        "author",
+        "author_url",
+        "license",
+        "icon",
+        "download_url",
+        "categories",
+        "description",
+    )
+
+    def __init__(
+        self,
+        name,
+        author,
+        author_url,
+        license,
+        icon,
+        download_url,
+        categories,
+        description,
+    ) -> None:
+        """
+        Initializes the CatalogEntry object.
+
+        :param name: The name of the AppImage.
+        :param author: The name of the first author, or None.
+        :param author_url: The url of the first author, or None.
+        :param license: The license, or None.
+        :param icon: The path of the first icon on appimage.github.io, or None.
+        :param download_url: The url of the download page.
+        :param categories: A tuple with the categories.
+        :param description: The description.
+        """
+        self.name = name
+        self.author = author
+        self.author_url = author_url
+        self.license = license
+        self.icon = icon
+        self.download_url = download_url
+        self.categories = categories
+        self.description = description
+
+    def fields(self):
+        """
+        Gets all the fields of the entry, to tell if two copies differ.
+
+        :return: A tuple with the fields.
+        """
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+
+class CatalogDiff:
+    """
+    The changes between two copies of the feed, as sets of names.
+    """
+
+    __slots__ = ("added", "removed", "changed")
+
+    def __init__(self, added, removed, changed) -> None:
+        """
+        Initializes the CatalogDiff object.
+
+        :param added: The names of the new entries.
+        :param removed: The names of the entries that are gone.
+        :param changed: The names of the entries whose fields changed.
+        """
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+def intern(value):
+    """
+    Interns a string, leaving other values untouched.
+
+    :param value: The value to intern.
+    :return: The interned string, or the value itself.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def parse_item(item):
+    """
+    Turns one item of feed.json into a CatalogEntry.
+
+    :param item: The item of the feed.
+    :return: The CatalogEntry, or None if the item can not be shown.
+    """
+    name = item.get("name")
+    links = item.get("links")
+    if not name or links is None:
+        return None
+
+    authors = item.get("authors") or []
+    author = authors[0] if authors and isinstance(authors[0], dict) else {}
+    icons = item.get("icons") or []
+
+    download_url = ""
+    for link in links:
+        if link.get("type") == "Download":
+            download_url = link.get("url", "")
+            break
+
+    categories = tuple(
+        intern(category)
+        for category in item.get("categories") or []
+        if category is not None
+    )
+    return CatalogEntry(
+        intern(name),
+        intern(author.get("name")),
+        author.get("url"),
+        intern(item.get("license")),
+        icons[0] if icons else None,
+        download_url,
+        categories,
+        item.get("description") or "",
+    )
+
+
+def diff_entries(old, new):
+    """
+    Compares two copies of the feed by name.
+
+    :param old: A dict mapping the names of the old copy to their CatalogEntry.
+    :param new: The CatalogEntry records of the new copy.
+    :return: A CatalogDiff.
+    """
+    new = {entry.name: entry for entry in new}
+    changed = {
+        name
+        for name, entry in new.items()
+        if name in old and old[name].fields() != entry.fields()
+    }
+    return CatalogDiff(new.keys() - old.keys(), old.keys() - new.keys(), changed)
+
+
+def parse_entries(chunks, on_chunk=None):
+    """
+    Parses feed.json from an iterable of byte chunks, keeping only CatalogEntry
+    records so that the raw items are dropped as soon as they are parsed.
+
+    :param chunks: The chunks of the body.
+    :param on_chunk: Called with the list of entries parsed so far,
+        every CHUNK_ITEMS entries.
+    :return: A list of CatalogEntry.
+    :raises ValueError: If the body is not a valid feed.
+    """
+    entries = []
+    for item in iter_items(chunks):
+        entry = parse_item(item)
+        if entry is None:
+            continue
+        entries.append(entry)
+        if on_chunk is not None and len(entries) % CHUNK_ITEMS == 0:
+            on_chunk(list(entries))
+    return entries
@@ -0,0 +1,373 @@
+import os
+import json
+import sqlite3
+import threading
+
+from catalog import CatalogDiff, CatalogEntry, intern
+from feed_cache import CACHE_DIR
+from search_index import tokenize
+
+CATALOG_DB_FILE = os.path.join(CACHE_DIR, "catalog.db")
+SCHEMA_VERSION = 1
+NAME_WEIGHT = 10.0  # bm25 weight of a name match against a description match
+MAX_VARIABLES = 500  # names bound per IN (...) query
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    author TEXT,
+    author_url TEXT,
+    license TEXT,
+    icon TEXT,
+    download_url TEXT,
+    categories TEXT NOT NULL,
+    description TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_position ON entries (position);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS entry_categories (
+    category_id INTEGER NOT NULL REFERENCES categories (id),
+    entry_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+    PRIMARY KEY (category_id, entry_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entry_categories_entry ON entry_categories (entry_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+    name, description, content='entries', content_rowid='id', prefix='1 2 3'
+);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, name, description)
+    VALUES (new.id, new.name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+END;
+"""
+
+ENTRY_COLUMNS = (
+    "name, author, author_url, license, icon, download_url, categories, description"
+)
+
+
+class CatalogDatabase:
+    """
+    A SQLite store of the catalog, used instead of SearchIndex when the
+    catalog_backend setting is "sqlite". The catalog survives restarts, so
+    nothing is parsed at startup, and only the entries being shown are loaded.
+    Categories live in indexed tables and names and descriptions in an FTS5
+    table, so filters, counts and bm25 ranked searches all run as SQL.
+    Queries go through their own connection, which WAL lets read the last
+    committed catalog while a sync writes the next one.
+    """
+
+    def __init__(self, path=CATALOG_DB_FILE) -> None:
+        """
+        Opens the catalog database, creating it if needed.
+
+        :param path: The path of the database.
+        :raises sqlite3.Error: If the database can not be opened,
+            or if SQLite was built without FTS5.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The connection is shared by the worker threads, behind the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.execute("PRAGMA foreign_keys = ON")
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self.drop()
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.commit()
+        self.reader = sqlite3.connect(path, check_same_thread=False)
+        self.read_lock = threading.Lock()
+
+    def drop(self):
+        """
+        Drops the tables of an older schema. Must be called with the lock held.
+        """
+        for statement in (
+            "DROP TABLE IF EXISTS entries_fts",
+            "DROP TABLE IF EXISTS entry_categories",
+            "DROP TABLE IF EXISTS categories",
+            "DROP TABLE IF EXISTS entries",
+        ):
+            self.connection.execute(statement)
+
+    def sync(self, items):
+        """
+        Brings the database in line with a new copy of the feed, in one transaction,
+        only rewriting the entries that were added, removed or changed.
+
+        :param items: The CatalogEntry records of the feed.
+        :return: A CatalogDiff with the changes.
+        """
+        rows = {}
+        for item in items:
+            rows[item.name] = (
+                item.name,
+                item.author,
+                item.author_url,
+                item.license,
+                item.icon,
+                item.download_url,
+                json.dumps(item.categories),
+                item.description,
+            )
+
+        with self.lock, self.connection:
+            cursor = self.connection.cursor()
+            existing = {
+                row[0]: row
+                for row in cursor.execute(f"SELECT {ENTRY_COLUMNS} FROM entries")
+            }
+            diff = CatalogDiff(
+                rows.keys() - existing.keys(),
+                existing.keys() - rows.keys(),
+                {
+                    name
+                    for name, row in rows.items()
+                    if name in existing and existing[name] != row
+                },
+            )
+            stale = [(name,) for name in diff.removed | diff.changed]
+            cursor.executemany("DELETE FROM entries WHERE name = ?", stale)
+
+            for position, (name, row) in enumerate(rows.items()):
+                if existing.get(name) == row:
+                    continue
+                cursor.execute(
+                    f"INSERT INTO entries ({ENTRY_COLUMNS}, position)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row + (position,),
+                )
+                entry_id = cursor.lastrowid
+                for category in json.loads(row[6]):
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO categories (name) VALUES (?)",
+                        (category,),
+                    )
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO entry_categories (category_id, entry_id)"
+                        " SELECT id, ? FROM categories WHERE name = ?",
+                        (entry_id, category),
+                    )
+
+            cursor.executemany(
+                "UPDATE entries SET position = ? WHERE name = ? AND position != ?",
+                ((position, name, position) for position, name in enumerate(rows)),
+            )
+            cursor.execute(
+                "DELETE FROM categories WHERE id NOT IN"
+                " (SELECT category_id FROM entry_categories)"
+            )
+        return diff
+
+    def count(self, category=None):
+        """
+        Counts the entries of a category.
+
+        :param category: The category, or None for every entry.
+        :return: The number of entries.
+        """
+        with self.read_lock:
+            if category is None:
+                query = "SELECT COUNT(*) FROM entries"
+                parameters = ()
+            else:
+                query = (
+                    "SELECT COUNT(*) FROM entry_categories"
+                    " JOIN categories ON categories.id = category_id"
+                    " WHERE categories.name = ?"
+                )
+                parameters = (category,)
+            return self.reader.execute(query, parameters).fetchone()[0]
+
+    def category_counts(self):
+        """
+        Counts the entries of every category.
+
+        :return: A dict mapping each category to its number of entries.
+        """
+        with self.read_lock:
+            return dict(
+                self.reader.execute(
+                    "SELECT categories.name, COUNT(*) FROM entry_categories"
+                    " JOIN categories ON categories.id = category_id"
+                    " GROUP BY category_id"
+                )
+            )
+
+    def filter(self, category=None, limit=None, offset=0):
+        """
+        Lists the entries of a category.
+
+        :param category: The category, or None for every entry.
+        :param limit: The size of the page, or None for every entry.
+        :param offset: The number of entries to skip.
+        :return: The names of the entries, in feed order.
+        """
+        if category is None:
+            query = "SELECT name FROM entries"
+            parameters = []
+        else:
+            query = (
+                "SELECT entries.name FROM entries"
+                " JOIN entry_categories ON entry_id = entries.id"
+                " JOIN categories ON categories.id = category_id"
+                " WHERE categories.name = ?"
+            )
+            parameters = [category]
+        query += " ORDER BY position" + self.page(parameters, limit, offset)
+        with self.read_lock:
+            return [row[0] for row in self.reader.execute(query, parameters)]
+
+    def download_urls(self):
+        """
+        Lists the download urls of the entries.
+
+        :return: A dict mapping the name of each entry to its download url.
+        """
+        with self.read_lock:
+            return dict(self.reader.execute("SELECT name, download_url FROM entries"))
+
+    def search(self, query, within=None, category=None, limit=None, offset=0):
+        """
+        Finds the entries matching every token of a query, as a prefix.
+
+        :param query: The search query.
+        :param within: Names to narrow down, or None to search every entry.
+            Kept for compatibility with SearchIndex, SQL does not need it.
+        :param category: Only match the entries of this category, if not None.
+        :param limit: The size of the page, or None for every match.
+        :param offset: The number of matches to skip.
+        :return: The names of the matching entries, best bm25 rank first,
+            then in feed order.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        sql, parameters = self.match("entries.name", tokens, category)
+        sql += f" ORDER BY bm25(entries_fts, {NAME_WEIGHT}, 1.0), position"
+        if within is None:
+            sql += self.page(parameters, limit, offset)
+
+        with self.read_lock:
+            names = [row[0] for row in self.reader.execute(sql, parameters)]
+        if within is not None:
+            within = set(within)
+            names = [name for name in names if name in within]
+            end = None if limit is None else offset + limit
+            names = names[offset:end]
+        return names
+
+    def count_search(self, query, category=None):
+        """
+        Counts the entries matching every token of a query, as a prefix.
+
+        :param query: The search query.
+        :param category: Only count the entries of this category, if not None.
+        :return: The number of matching entries.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return 0
+        sql, parameters = self.match("COUNT(*)", tokens, category)
+        with self.read_lock:
+            return self.reader.execute(sql, parameters).fetchone()[0]
+
+    def match(self, columns, tokens, category):
+        """
+        Builds a full text query of the entries.
+
+        :param columns: The columns to select.
+        :param tokens: The tokens that must all match, as a prefix.
+        :param category: Only match the entries of this category, if not None.
+        :return: The query and its parameters.
+        """
+        sql = (
+            f"SELECT {columns} FROM entries_fts"
+            " JOIN entries ON entries.id = entries_fts.rowid"
+            " WHERE entries_fts MATCH ?"
+        )
+        parameters = [" ".join(f'"{token}"*' for token in tokens)]
+        if category is not None:
+            sql += (
+                " AND entries.id IN (SELECT entry_id FROM entry_categories"
+                " JOIN categories ON categories.id = category_id"
+                " WHERE categories.name = ?)"
+            )
+            parameters.append(category)
+        return sql, parameters
+
+    def page(self, parameters, limit, offset):
+        """
+        Builds the LIMIT / OFFSET clause of a query.
+
+        :param parameters: The parameters of the query, extended in place.
+        :param limit: The size of the page, or None for no limit.
+        :param offset: The number of rows to skip.
+        :return: The clause.
+        """
+        if limit is None and not offset:
+            return ""
+        parameters.extend((-1 if limit is None else limit, offset))
+        return " LIMIT ? OFFSET ?"
+
+    def get_entries(self, names):
+        """
+        Loads the entries with some names.
+
+        :param names: The names of the entries.
+        :return: A list of CatalogEntry, in the order of the names.
+        """
+        names = list(names)
+        entries = {}
+        with self.read_lock:
+            for start in range(0, len(names), MAX_VARIABLES):
+                batch = names[start : start + MAX_VARIABLES]
+                placeholders = ", ".join("?" * len(batch))
+                for row in self.reader.execute(
+                    f"SELECT {ENTRY_COLUMNS} FROM entries"
+                    f" WHERE name IN ({placeholders})",
+                    batch,
+                ):
+                    entries[row[0]] = self.entry(row)
+        return [entries[name] for name in names if name in entries]
+
+    def entry(self, row):
+        """
+        Turns a row of the entries table into a CatalogEntry.
+
+        :param row: The row.
+        :return: The CatalogEntry.
+        """
+        (
+            name,
+            author,
+            author_url,
+            license,
+            icon,
+            download_url,
+            categories,
+            description,
+        ) = row
+        return CatalogEntry(
+            intern(name),
+            intern(author),
+            author_url,
+            intern(license),
+            icon,
+            download_url,
+            tuple(intern(category) for category in json.loads(categories)),
+            description,
+        )
@@ -1,10 +1,156 @@
+import os
+import json
+import difflib
+import sqlite3
 import threading
+from collections import OrderedDict
 import gi
 import requests
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Gtk, Adw, GLib, Gio, GdkPixbuf
+from gi.repository import Gtk, Adw, GLib, Gio, Gdk, GdkPixbuf, GObject
+
+from bundle import CatalogBundle
+from catalog_db import CatalogDatabase
+from downloader import format_progress, resolve_appimage
+from feed_cache import CACHE_DIR, FeedCache
+from fetch_pool import CancelToken, shared_pool
+from image_cache import ImageCache
+from installer import Install, app_name
+from search_index import SearchIndex
+from settings import load_settings
+from texture_cache import shared_texture_cache
+
+APPIMAGE_IO_URL = "https://appimage.github.io/database"
+ICON_SIZE = 50
+SCREENSHOT_SIZE = 400
+SEARCH_DELAY = 250  # milliseconds
+FIRST_BATCH = 50  # rows shown at once, enough to fill the window
+BATCH_SIZE = 100  # rows appended per store splice
+FRAME_BUDGET = 8000  # microseconds of row appending per main loop iteration
+SCROLL_DELAY = 50  # milliseconds between two updates of the fetch priorities
+ROW_HEIGHT = ICON_SIZE + 20  # height of a collapsed row until one is measured
+DROP_ROWS = 60  # distance from the viewport, in rows, past which fetches are dropped
+SEEN_FILE = os.path.join(CACHE_DIR, "seen.json")
+NEW_CATEGORY = "::new"  # combo id of the "new since last visit" view
+WINDOW_PAGE = 100  # entries loaded per query by a CatalogWindow
+WINDOW_PAGES = 10  # pages a CatalogWindow keeps loaded
+
+
+class CatalogItem(GObject.Object):
+    """
+    An item of the catalog list store, wrapping one CatalogEntry.
+    """
+
+    def __init__(self, item) -> None:
+        """
+        Initializes the CatalogItem object.
+
+        :param item: The CatalogEntry.
+        """
+        super().__init__()
+        self.item = item
+
+
+class CatalogWindow(GObject.Object, Gio.ListModel):
+    """
+    A list model over a query of the catalog database, used by the sqlite backend
+    instead of a list store holding every entry. Entries are loaded by pages of
+    WINDOW_PAGE with LIMIT / OFFSET as rows ask for them, and only the last
+    WINDOW_PAGES pages used are kept, so the memory does not grow with the catalog.
+    """
+
+    def __init__(self, catalog_db, query, n_items) -> None:
+        """
+        Initializes the CatalogWindow object.
+
+        :param catalog_db: The CatalogDatabase.
+        :param query: Called with a limit and an offset, returns the names of a page.
+        :param n_items: The number of entries the query matches.
+        """
+        super().__init__()
+        self.catalog_db = catalog_db
+        self.query = query
+        self.n_items = n_items
+        self.pages = OrderedDict()
+
+    def do_get_item_type(self):
+        """
+        Gets the type of the items of the model.
+
+        :return: The GType of CatalogItem.
+        """
+        return CatalogItem.__gtype__
+
+    def do_get_n_items(self):
+        """
+        Gets the number of items of the model.
+
+        :return: The number of entries the query matches.
+        """
+        return self.n_items
+
+    def do_get_item(self, position):
+        """
+        Gets an item of the model, loading its page if needed.
+
+        :param position: The position of the item.
+        :return: The CatalogItem, or None if there is none at that position.
+        """
+        if position >= self.n_items:
+            return None
+        index, offset = divmod(position, WINDOW_PAGE)
+        page = self.load_page(index)
+        # The catalog may have shrunk since it was counted, until the next reload
+        return page[offset] if offset < len(page) else None
+
+    def load_page(self, index):
+        """
+        Gets a page of the query, loading it if it is not kept.
+
+        :param index: The number of the page.
+        :return: A list of CatalogItem objects.
+        """
+        page = self.pages.get(index)
+        if page is not None:
+            self.pages.move_to_end(index)
+            return page
+        names = self.query(WINDOW_PAGE, index * WINDOW_PAGE)
+        page = [CatalogItem(item) for item in self.catalog_db.get_entries(names)]
+        self.pages[index] = page
+        if len(self.pages) > WINDOW_PAGES:
+            self.pages.popitem(last=False)
+        return page
+
+
+class CatalogRow(Adw.ExpanderRow):
+    """
+    A row of the catalog list view. Rows are recycled while scrolling,
+    so they keep track of the item they are currently bound to.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes the CatalogRow object.
+        """
+        super().__init__()
+        self.item = None
+        self.token = None
+        self.body = None
+        self.list_item = None
+        self.icon_dropped = False
+
+        self.icon = Gtk.Image()
+        self.icon.set_pixel_size(ICON_SIZE)
+        self.icon.set_from_icon_name("image-missing")
+        self.icon.set_halign(Gtk.Align.CENTER)
+        self.icon.set_valign(Gtk.Align.CENTER)
+        self.icon.set_margin_bottom(10)
+        self.icon.set_margin_end(10)
+        self.icon.set_margin_start(10)
+        self.icon.set_margin_top(10)
+        self.add_prefix(self.icon)
 
 
 class Download_Page(Adw.Application):
@@ -14,52 +160,301 @@ class Download_Page(Adw.Application):
     about available AppImages from the appimage.github.io feed.json file.
     """
 
-    download_app_rows = []
-
-    def __init__(self, ui) -> None:
+    def __init__(self, ui, home_page) -> None:
         """
         Initializes the Download_Page object.
 
         :param ui: The user interface object.
+        :param home_page: The home page, where installed AppImages are added.
         """
         super().__init__()
         self.ui = ui
+        self.home_page = home_page
 
-        self.data = self.getData()
+        self.feed_cache = FeedCache()
+        self.fetch_pool = shared_pool()
+        settings = load_settings()
+        self.image_cache = ImageCache(
+            max_bytes=settings["image_cache_max_bytes"],
+            max_age=settings["image_cache_max_age"],
+            negative_ttl=settings["image_negative_ttl"],
+        )
+        self.texture_cache = shared_texture_cache(settings["texture_cache_max_bytes"])
+        self.download_segments = settings["download_segments"]
+        # AppImage installs outlive the rows, which show them while bound
+        self.downloads = {}
+        self.download_widgets = {}
+        # An offline bundle, when set, replaces the feed and is read in place
+        self.bundle = None
+        if settings.get("catalog_bundle"):
+            try:
+                self.bundle = CatalogBundle(settings["catalog_bundle"])
+            except (OSError, ValueError) as e:
+                print(f"Error opening catalog bundle: {e}")
+        self.items_by_name = {}
+        self.catalog_db = None
+        if settings["catalog_backend"] == "sqlite":
+            try:
+                self.catalog_db = CatalogDatabase()
+            except sqlite3.Error as e:
+                print(f"Error opening catalog database: {e}")
+        # Both backends answer the same filter, search and count queries
+        self.search_index = (
+            SearchIndex() if self.catalog_db is None else self.catalog_db
+        )
         self.category_filter = None
-        self.download_app_rows = []
-        self.ui.category_combo.connect("changed", self.on_category_changed)
-        self.populate_categories()
+        # Names that were not in the catalog on the last visit
+        self.new_names = None
+        self.refresh_lock = threading.Lock()
+
+        # Image fetches are queued by the distance of their row to the viewport
+        self.bound_rows = {}
+        self.row_height = ROW_HEIGHT
+        self.scroll_timeout = None
+        self.ui.download_window.get_vadjustment().connect(
+            "value-changed", self.on_scroll
+        )
+
+        # The list shows the store, or a CatalogWindow with the sqlite backend
+        self.download_store = Gio.ListStore(item_type=CatalogItem)
+        self.download_selection = Gtk.NoSelection(model=self.download_store)
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.setup_download_row)
+        factory.connect("bind", self.bind_download_row)
+        factory.connect("unbind", self.unbind_download_row)
+        self.ui.download_list_view.set_model(self.download_selection)
+        self.ui.download_list_view.set_factory(factory)
+
+        # Each load of the list gets a new token and cancels the previous one,
+        # so that an older category change or search stops early.
+        self.load_token = CancelToken()
+        self.last_search = None
+
+        self.category_handler = self.ui.category_combo.connect(
+            "changed", self.on_category_changed
+        )
+        # The entry only emits search-changed once the user pauses typing
+        self.ui.search_entry.set_search_delay(SEARCH_DELAY)
         self.ui.search_entry.connect("activate", self.on_search_activated)
-        self.showData(self.category_filter)
-        self.ui.category_combo.set_active(0)
+        self.ui.search_entry.connect("search-changed", self.on_search_activated)
+
+        # The feed is read and revalidated off the main thread, the spinner
+        # added by Ui stays in the group until the first copy arrives.
+        thread = threading.Thread(target=self.load_feed, daemon=True)
+        thread.start()
+
+        if self.bundle is None and settings["feed_refresh_interval"] > 0:
+            GLib.timeout_add_seconds(
+                settings["feed_refresh_interval"], self.on_refresh_timeout
+            )
 
     def getData(self, selected_category=None):
         """
-        Retrieves data from the appimage.github.io feed.json file.
+        Retrieves data from the cached copy of the appimage.github.io feed.json file.
+        The cached copy is revalidated in the background by load_feed.
 
         :param selected_category: The selected category to filter the data by.
-        :return: The retrieved data.
+        :return: The retrieved entries, as a list of CatalogEntry.
+        """
+        if self.bundle is not None:
+            try:
+                return self.bundle.entries()
+            except (OSError, ValueError) as e:
+                print(f"Error reading catalog bundle: {e}")
+                return []
+        return self.feed_cache.load() or []
+
+    def load_feed(self):
+        """
+        Shows the cached feed, then revalidates it and refreshes the page if it changed.
+        Without a cached copy, the downloaded entries are shown in chunks while parsing.
+        A catalog bundle is never revalidated, so that it also works offline.
+        The installed AppImages are checked for updates once a catalog is loaded.
+        """
+        if (
+            self.bundle is None
+            and self.catalog_db is not None
+            and self.catalog_db.count()
+        ):
+            # The database kept the catalog of the last run, nothing is parsed
+            shown = True
+            self.mark_seen(self.catalog_db.filter())
+            GLib.idle_add(self.refresh_data, None)
+        else:
+            entries = self.getData()
+            shown = bool(entries)
+            if entries:
+                self.search_index.sync(entries)
+                self.mark_seen(entry.name for entry in entries)
+                GLib.idle_add(self.refresh_data, entries)
+        if shown or self.bundle is not None:
+            self.check_updates()
+        if self.bundle is not None:
+            GLib.idle_add(self.hide_spinner)
+            return
+
+        self.refresh_feed(None if shown else self.on_feed_chunk)
+        if not shown:
+            self.check_updates()
+
+    def check_updates(self):
+        """
+        Checks the installed AppImages for updates on the home page, so that
+        the ones added without a source are matched with the catalog.
+        """
+        GLib.idle_add(self.home_page.check_updates, self.search_index.download_urls())
+
+    def refresh_feed(self, on_chunk=None):
+        """
+        Revalidates the feed and applies what changed to the page.
+        Once a copy is shown, only the changed entries are updated.
+
+        :param on_chunk: Called with the entries parsed so far,
+            when nothing is shown yet.
+        """
+        with self.refresh_lock:
+            # Without a copy on screen, a 304 would leave the page empty
+            entries = self.feed_cache.revalidate(on_chunk, conditional=on_chunk is None)
+            if entries is None:
+                GLib.idle_add(self.hide_spinner)
+                return
+            diff = self.search_index.sync(entries)
+            self.mark_seen((entry.name for entry in entries), diff)
+            if on_chunk is not None:
+                GLib.idle_add(self.refresh_data, entries, diff)
+            elif diff:
+                GLib.idle_add(self.refresh_data, entries, diff)
+
+    def on_refresh_timeout(self):
         """
-        url = "https://appimage.github.io/feed.json"
-        response = requests.get(url)
-        data = response.json()
-        return data
+        Refreshes the feed in the background, every feed_refresh_interval seconds.
+        """
+        thread = threading.Thread(target=self.refresh_feed, daemon=True)
+        thread.start()
+        return True
+
+    def mark_seen(self, names, diff=None):
+        """
+        Records the names of the catalog as seen. The first time in a session,
+        the names that were not seen on the last visit become the new names.
+
+        :param names: The names of the catalog.
+        :param diff: The CatalogDiff of a refresh, its added names are new too.
+        """
+        names = list(names)
+        if self.new_names is None:
+            seen = self.load_seen()
+            # On the very first visit nothing is new
+            self.new_names = set() if seen is None else set(names) - seen
+        elif diff is not None:
+            self.new_names = (self.new_names | diff.added) - diff.removed
+        self.save_seen(names)
+
+    def load_seen(self):
+        """
+        Loads the names of the catalog seen on the last visit.
+
+        :return: A set with the names, or None if there was no visit yet.
+        """
+        try:
+            with open(SEEN_FILE, "r") as f:
+                return set(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error loading seen apps: {e}")
+            return None
+
+    def save_seen(self, names):
+        """
+        Saves the names of the catalog seen on this visit.
+
+        :param names: The names of the catalog.
+        """
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            self.feed_cache.write_atomic(SEEN_FILE, json.dumps(names).encode())
+        except OSError as e:
+            print(f"Error saving seen apps: {e}")
+
+    def on_feed_chunk(self, entries):
+        """
+        Shows the entries parsed so far, while the rest of the feed is still read.
+        Once the first chunk is shown, the next ones only append their rows.
+
+        :param entries: The list of CatalogEntry parsed so far.
+        """
+        diff = self.search_index.sync(entries)
+        GLib.idle_add(self.refresh_data, entries, diff)
+
+    def hide_spinner(self):
+        """
+        Removes the loading spinner from the download group.
+        """
+        if self.ui.download_spinner.get_parent() is not None:
+            self.ui.download_app_group.remove(self.ui.download_spinner)
+        return False
+
+    def refresh_data(self, entries, diff=None):
+        """
+        Replaces the entries with a newer copy of the feed and refreshes the page.
+
+        :param entries: The new list of CatalogEntry, or None if they are only
+            kept in the catalog database.
+        :param diff: The CatalogDiff from the shown copy, to patch the list
+            instead of reloading it.
+        """
+        if self.catalog_db is None:
+            self.items_by_name = {entry.name: entry for entry in entries}
+        self.hide_spinner()
+        active = self.ui.category_combo.get_active_id()
+        with self.ui.category_combo.handler_block(self.category_handler):
+            self.ui.category_combo.remove_all()
+            self.populate_categories()
+            if (
+                diff is not None
+                and active is not None
+                and self.ui.category_combo.set_active_id(active)
+            ):
+                self.update_view(diff)
+                return False
+
+        # Selecting a category, even the same one, reloads the list
+        if active is None or not self.ui.category_combo.set_active_id(active):
+            self.ui.category_combo.set_active(0)
+        return False
 
     def showData(self, selected_category):
         """
-        Displays the retrieved data.
+        Displays the retrieved data, filtered by category and by the search text.
 
         :param selected_category: The selected category to filter the data by.
         """
-        for row in self.download_app_rows:
-            self.ui.download_app_group.remove(row)
-        self.download_app_rows = []
+        self.category_filter = selected_category
+        self.last_search = None
+        search_query = self.ui.search_entry.get_text()
+        if search_query:
+            self.searchData(search_query)
+            return
+
+        token = self.new_load_token()
         thread = threading.Thread(
-            target=self.load_data_and_images, args=(selected_category,), daemon=True
+            target=self.load_data_and_images,
+            args=(selected_category, token),
+            daemon=True,
         )
         thread.start()
 
+    def new_load_token(self):
+        """
+        Cancels the current load of the list and starts a new one.
+
+        :return: The CancelToken of the new load.
+        """
+        self.load_token.cancel()
+        self.load_token = CancelToken()
+        return self.load_token
+
     def on_search_activated(self, entry):
         """
         Activates the search functionality.
@@ -67,82 +462,328 @@ class Download_Page(Adw.Application):
         :param entry: The search entry object.
         """
         search_query = entry.get_text()
-        self.ui.category_combo.set_active(0)
-        active_item = self.ui.category_combo.get_active_iter()
-        if active_item:
-            selected_category = self.ui.category_combo.get_model().get_value(
-                active_item, 0
-            )
-        else:
-            selected_category = None
+        if self.last_search is not None and self.last_search[0] == search_query:
+            return
+
         if not search_query:
-            self.showData(selected_category)
+            self.showData(self.category_filter)
         else:
             self.searchData(search_query)
 
     def searchData(self, search_query):
         """
-        Searches for data based on the search query.
+        Searches for data based on the search query, within the selected category.
+        When the query extends the previous one, only the previous results are filtered.
 
         :param search_query: The search query.
         """
-        for row in self.download_app_rows:
-            self.ui.download_app_group.remove(row)
-        self.download_app_rows = []
+        within = None
+        if self.last_search is not None:
+            last_query, last_results = self.last_search
+            if search_query.casefold().startswith(last_query.casefold()):
+                within = last_results
+
+        token = self.new_load_token()
         thread = threading.Thread(
-            target=self.load_search_data_and_images, args=(search_query,), daemon=True
+            target=self.load_search_data_and_images,
+            args=(search_query, self.category_filter, within, token),
+            daemon=True,
         )
         thread.start()
 
-    def load_search_data_and_images(self, search_query):
+    def load_search_data_and_images(
+        self, search_query, selected_category, within, token
+    ):
         """
         Loads the search data and images.
 
         :param search_query: The search query.
+        :param selected_category: The selected category to filter the data by.
+        :param within: The names to narrow down, or None to search the whole feed.
+        :param token: The CancelToken of the load.
         """
-        items = self.data["items"]
-        search_results = []
-        for item in items:
-            name = item.get("name", "")
-            description = item.get("description", "")
-            if (
-                search_query.lower() in name.lower()
-                or search_query.lower() in description.lower()
-            ):
-                search_results.append(item)
+        window = self.catalog_window(search_query, selected_category)
+        if window is not None:
+            if token.is_cancelled():
+                return
+            GLib.idle_add(self.show_search_window, search_query, window, token)
+            return
 
-        appimage_io_url = "https://appimage.github.io/database"
+        names = self.search_names(search_query, within, selected_category)
+        if token.is_cancelled():
+            return
+
+        search_results = self.catalog_items(names)
 
-        self.setup_download_row(
-            None, search_results, len(search_results), appimage_io_url
-        )
         GLib.idle_add(
-            self.ui.download_app_group.set_title,
-            f"Search Results - {len(search_results)}",
+            self.show_search_results, search_query, names, search_results, token
         )
 
-    def load_data_and_images(self, selected_category):
+    def show_search_results(self, search_query, names, search_results, token):
+        """
+        Displays the results of a search, unless a newer load started meanwhile.
+
+        :param search_query: The search query.
+        :param names: The names of the matching items.
+        :param search_results: The matching items.
+        :param token: The CancelToken of the load.
+        """
+        if token.is_cancelled():
+            return False
+        self.last_search = (search_query, names)
+        return self.show_items(
+            search_results, f"Search Results - {len(search_results)}", token
+        )
+
+    def show_search_window(self, search_query, window, token):
+        """
+        Displays the results of a search in the catalog database,
+        unless a newer load started meanwhile.
+
+        :param search_query: The search query.
+        :param window: The CatalogWindow of the results.
+        :param token: The CancelToken of the load.
+        """
+        if token.is_cancelled():
+            return False
+        # SQL searches the whole catalog, there are no results to narrow down
+        self.last_search = (search_query, None)
+        return self.show_window(window, f"Search Results - {window.n_items}", token)
+
+    def load_data_and_images(self, selected_category, token):
         """
         Loads the data and images.
 
         :param selected_category: The selected category to filter the data by.
+        :param token: The CancelToken of the load.
         """
-        items = self.data["items"]
-        appimages_count = 0
-        filtered_items = []
-        for item in items:
-            if selected_category in item["categories"]:
-                filtered_items.append(item)
-                appimages_count += 1
+        window = self.catalog_window(None, selected_category)
+        if window is not None:
+            if token.is_cancelled():
+                return
+            GLib.idle_add(
+                self.show_window, window, f"Appimages - {window.n_items}", token
+            )
+            return
 
-        appimage_io_url = "https://appimage.github.io/database"
+        filtered_items = self.catalog_items(self.filter_names(selected_category))
+        if token.is_cancelled():
+            return
 
-        self.setup_download_row(
-            selected_category, filtered_items, appimages_count, appimage_io_url
-        )
         GLib.idle_add(
-            self.ui.download_app_group.set_title, f"Appimages - {appimages_count}"
+            self.show_items,
+            filtered_items,
+            f"Appimages - {len(filtered_items)}",
+            token,
+        )
+
+    def filter_names(self, category):
+        """
+        Lists the names of a category, or of the new apps.
+
+        :param category: The category, NEW_CATEGORY, or None for every app.
+        :return: The names, in feed order.
+        """
+        if category == NEW_CATEGORY:
+            new_names = self.new_names or set()
+            return [name for name in self.search_index.filter() if name in new_names]
+        return self.search_index.filter(category)
+
+    def search_names(self, search_query, within, category):
+        """
+        Searches the names of a category, or of the new apps.
+
+        :param search_query: The search query.
+        :param within: The names to narrow down, or None to search the whole feed.
+        :param category: The category, NEW_CATEGORY, or None for every app.
+        :return: The matching names.
+        """
+        if category == NEW_CATEGORY:
+            new_names = self.new_names or set()
+            within = new_names if within is None else new_names.intersection(within)
+            category = None
+        return self.search_index.search(search_query, within, category)
+
+    def update_view(self, diff):
+        """
+        Patches the list after a delta refresh, off the main thread.
+
+        :param diff: The CatalogDiff of the refresh.
+        """
+        # The results of the previous query may miss the added apps
+        self.last_search = None
+        token = self.new_load_token()
+        thread = threading.Thread(
+            target=self.load_view_update,
+            args=(self.ui.search_entry.get_text(), self.category_filter, diff, token),
+            daemon=True,
+        )
+        thread.start()
+
+    def load_view_update(self, search_query, selected_category, diff, token):
+        """
+        Loads the new content of the list after a delta refresh.
+
+        :param search_query: The search text, or an empty string.
+        :param selected_category: The selected category to filter the data by.
+        :param diff: The CatalogDiff of the refresh.
+        :param token: The CancelToken of the load.
+        """
+        window = self.catalog_window(search_query, selected_category)
+        if window is not None:
+            if token.is_cancelled():
+                return
+            # Windows are reloaded, their rows were never all bound anyway
+            title = "Search Results" if search_query else "Appimages"
+            GLib.idle_add(
+                self.show_window, window, f"{title} - {window.n_items}", token
+            )
+            return
+
+        if search_query:
+            names = self.search_names(search_query, None, selected_category)
+            title = f"Search Results - {len(names)}"
+        else:
+            names = self.filter_names(selected_category)
+            title = f"Appimages - {len(names)}"
+        if token.is_cancelled():
+            return
+
+        items = self.catalog_items(names)
+        GLib.idle_add(self.patch_items, items, diff.changed, title, token)
+
+    def patch_items(self, items, changed, title, token):
+        """
+        Applies the smallest set of splices turning the list store into the new items,
+        so that the rows of unchanged apps stay bound and keep their images.
+
+        :param items: The new CatalogItem objects of the list.
+        :param changed: The names of the apps whose fields changed.
+        :param title: The title of the download group.
+        :param token: The CancelToken of the load.
+        """
+        if token.is_cancelled():
+            return False
+        if self.download_selection.get_model() is not self.download_store:
+            return self.show_items(items, title, token)
+        store = self.download_store
+        old = [store.get_item(i).item.name for i in range(store.get_n_items())]
+        new = [item.item.name for item in items]
+        matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+        # Going backwards keeps the positions of the earlier blocks valid
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag != "equal":
+                store.splice(i1, i2 - i1, items[j1:j2])
+                continue
+            for offset in range(i2 - i1):
+                if new[j1 + offset] in changed:
+                    store.splice(i1 + offset, 1, [items[j1 + offset]])
+        self.ui.download_app_group.set_title(title)
+        return False
+
+    def catalog_items(self, names):
+        """
+        Prepares the list store items for some names, off the main thread.
+
+        :param names: The names of the items.
+        :return: A list of CatalogItem objects.
+        """
+        if self.catalog_db is not None:
+            return [CatalogItem(item) for item in self.catalog_db.get_entries(names)]
+
+        items_by_name = self.items_by_name
+        catalog_items = []
+        for name in names:
+            item = items_by_name.get(name)
+            if item is not None:
+                catalog_items.append(CatalogItem(item))
+        return catalog_items
+
+    def catalog_window(self, search_query, category):
+        """
+        Prepares a CatalogWindow over a view of the catalog database, off the main thread.
+
+        :param search_query: The search text, or None to list the category.
+        :param category: The category, NEW_CATEGORY, or None for every app.
+        :return: The CatalogWindow with its first page loaded, or None without the
+            catalog database and for the new apps, which are listed by name.
+        """
+        catalog_db = self.catalog_db
+        if catalog_db is None or category == NEW_CATEGORY:
+            return None
+        if search_query:
+            window = CatalogWindow(
+                catalog_db,
+                lambda limit, offset: catalog_db.search(
+                    search_query, None, category, limit, offset
+                ),
+                catalog_db.count_search(search_query, category),
+            )
+        else:
+            window = CatalogWindow(
+                catalog_db,
+                lambda limit, offset: catalog_db.filter(category, limit, offset),
+                catalog_db.count(category),
+            )
+        window.load_page(0)
+        return window
+
+    def show_window(self, window, title, token):
+        """
+        Shows a CatalogWindow in the list, unless a newer load started meanwhile.
+
+        :param window: The CatalogWindow.
+        :param title: The title of the download group.
+        :param token: The CancelToken of the load.
+        """
+        if token.is_cancelled():
+            return False
+        self.download_selection.set_model(window)
+        self.download_store.remove_all()
+        self.ui.download_app_group.set_title(title)
+        return False
+
+    def show_items(self, items, title, token):
+        """
+        Replaces the content of the catalog list store,
+        unless a newer load started meanwhile.
+        The first screenful is shown at once, the rest is streamed in by materialize_rows.
+
+        :param items: The CatalogItem objects to display.
+        :param title: The title of the download group.
+        :param token: The CancelToken of the load.
+        """
+        if token.is_cancelled():
+            return False
+        self.download_store.splice(
+            0, self.download_store.get_n_items(), items[:FIRST_BATCH]
         )
+        if self.download_selection.get_model() is not self.download_store:
+            self.download_selection.set_model(self.download_store)
+        self.ui.download_app_group.set_title(title)
+        if len(items) > FIRST_BATCH:
+            GLib.idle_add(self.materialize_rows, items, FIRST_BATCH, token)
+        return False
+
+    def materialize_rows(self, items, start, token):
+        """
+        Appends items to the list store in batches, for at most FRAME_BUDGET per call,
+        so that the main loop can draw a frame between two calls.
+
+        :param items: The CatalogItem objects to display.
+        :param start: The index of the first item not yet in the store.
+        :param token: The CancelToken of the load.
+        """
+        if token.is_cancelled():
+            return False
+        deadline = GLib.get_monotonic_time() + FRAME_BUDGET
+        while start < len(items) and GLib.get_monotonic_time() < deadline:
+            end = min(start + BATCH_SIZE, len(items))
+            self.download_store.splice(start, 0, items[start:end])
+            start = end
+        if start < len(items):
+            GLib.idle_add(self.materialize_rows, items, start, token)
+        return False
 
     def on_category_changed(self, combo):
         """
@@ -150,241 +791,454 @@ class Download_Page(Adw.Application):
 
         :param combo: The category combo object.
         """
-        active_item = combo.get_active_iter()
-        if active_item:
-            selected_category = combo.get_model().get_value(active_item, 0)
-            self.showData(selected_category)
+        if combo.get_active_iter():
+            self.showData(combo.get_active_id() or None)
 
     def populate_categories(self):
         """
-        Populates the categories combo box.
+        Populates the categories combo box, with the number of items of each category.
         """
-        categories = set()
-        for item in self.data["items"]:
-            if "categories" in item:
-                categories.update(item["categories"])
-        categories = [category for category in categories if category is not None]
-        self.ui.category_combo.append_text("Categories")
+        counts = self.search_index.category_counts()
+        self.ui.category_combo.append("", f"Categories ({self.search_index.count()})")
+        if self.new_names:
+            self.ui.category_combo.append(
+                NEW_CATEGORY, f"New since last visit ({len(self.new_names)})"
+            )
 
-        for category in sorted(categories):
-            self.ui.category_combo.append_text(category)
+        for category in sorted(counts):
+            self.ui.category_combo.append(category, f"{category} ({counts[category]})")
 
-    def setup_download_row(
-        self, selected_category, items, appimages_count, appimage_io_url
-    ):
+    def setup_download_row(self, factory, list_item):
         """
-        Sets up the download row.
+        Sets up a download row, which is then reused for any item of the catalog.
 
-        :param selected_category: The selected category to filter the data by.
-        :param items: The items to display.
-        :param appimages_count: The number of appimages to display.
+        :param factory: The list item factory.
+        :param list_item: The list item to set up.
+        """
+        appimage_row = CatalogRow()
+        # The body of the row is only built the first time it is expanded
+        appimage_row.connect("notify::expanded", self.on_row_expanded)
+        list_item.set_child(appimage_row)
+        list_item.set_activatable(False)
+
+    def bind_download_row(self, factory, list_item):
+        """
+        Binds a download row to the item it has to show.
+
+        :param factory: The list item factory.
+        :param list_item: The list item to bind.
+        """
+        appimage_row = list_item.get_child()
+        catalog_item = list_item.get_item()
+        if catalog_item is None:
+            return
+        item = catalog_item.item
+
+        appimage_row.item = item
+        appimage_row.token = CancelToken()
+        appimage_row.list_item = list_item
+        self.bound_rows[appimage_row.token] = appimage_row
+        appimage_row.set_title(item.name)
+        appimage_row.set_subtitle(item.author or "")
+        self.get_icon(appimage_row, APPIMAGE_IO_URL, item)
+
+    def unbind_download_row(self, factory, list_item):
+        """
+        Releases a download row, so that it can be bound to another item.
+
+        :param factory: The list item factory.
+        :param list_item: The list item to unbind.
+        """
+        appimage_row = list_item.get_child()
+        if appimage_row.token is None:
+            return
+        # Pending icon and screenshot fetches of the old item are dropped
+        appimage_row.token.cancel()
+        self.bound_rows.pop(appimage_row.token, None)
+        name = appimage_row.item.name
+        appimage_row.token = None
+        appimage_row.item = None
+        appimage_row.list_item = None
+        appimage_row.icon_dropped = False
+        appimage_row.set_expanded(False)
+        if appimage_row.body is not None:
+            # The progress of a running install is shown again when a body is rebuilt
+            widgets = self.download_widgets.get(name)
+            if widgets is not None and widgets[0].is_ancestor(appimage_row.body):
+                del self.download_widgets[name]
+            appimage_row.remove(appimage_row.body)
+            appimage_row.body = None
+
+    def on_row_expanded(self, appimage_row, param):
+        """
+        Builds the body of a download row when it is expanded for the first time.
+
+        :param appimage_row: The expanded row.
+        :param param: The expanded property.
+        """
+        if not appimage_row.get_expanded() or appimage_row.body is not None:
+            return
+        if appimage_row.item is None:
+            return
+        appimage_row.body = self.setup_row_body(
+            appimage_row.item, APPIMAGE_IO_URL, appimage_row.token
+        )
+        appimage_row.add_row(appimage_row.body)
+
+    def setup_row_body(self, item, appimage_io_url, token):
+        """
+        Sets up the body of a download row.
+
+        :param item: The CatalogEntry shown by the row.
         :param appimage_io_url: The appimage.io url.
+        :param token: The CancelToken of the row binding.
+        :return: The box with the body of the row.
         """
-        for item in items:
-            name = item["name"]
-            categories = item.get("categories", [])
-            authors = item.get("authors", "")
-            authors_name = authors[0]["name"] if authors and len(authors) > 0 else None
-            authors_url = authors[0]["url"] if authors and len(authors) > 0 else None
-            license = item.get("license", "")
+        name = item.name
+        authors_name = item.author
+        authors_url = item.author_url
+        license = item.license or ""
+        description = item.description
+        download_url = item.download_url
+
+        download_button = Gtk.Button(
+            label="Github Release",
+            margin_bottom=10,
+            margin_end=10,
+            margin_start=10,
+            margin_top=10,
+            css_classes=["suggested-action"],
+        )
+        download_button.connect("clicked", self.on_download_clicked, download_url)
+        get_button = Gtk.Button(
+            label="Install",
+            margin_bottom=10,
+            margin_end=10,
+            margin_start=10,
+            margin_top=10,
+        )
+        get_button.connect("clicked", self.on_install_clicked, item)
+        button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+        button_box.append(download_button)
+        button_box.append(get_button)
+        progress_bar = Gtk.ProgressBar(
+            show_text=True,
+            visible=False,
+            margin_end=10,
+            margin_start=10,
+        )
+        self.download_widgets[name] = (get_button, progress_bar)
+        self.show_download_progress(name)
 
-            icon = self.get_icon(appimage_io_url, item)
-            screenshot = self.get_image(appimage_io_url, name)
+        info_box = Gtk.Box(
+            orientation=Gtk.Orientation.VERTICAL,
+            margin_bottom=10,
+            margin_end=10,
+            margin_start=10,
+            margin_top=10,
+            spacing=10,
+        )
+        author_label = Gtk.Label(
+            label=f'Author: <a href="{authors_url}">{authors_name}</a>',
+            margin_bottom=10,
+            margin_end=10,
+            margin_start=10,
+            margin_top=10,
+            wrap=True,
+            xalign=0,
+            use_markup=True,
+        )
+        license_label = Gtk.Label(
+            label=f"License: {license}",
+            margin_bottom=10,
+            margin_end=10,
+            margin_start=10,
+            margin_top=10,
+            wrap=True,
+            xalign=0,
+        )
+        description_label = Gtk.Label(
+            label=f"Description: {description}",
+            margin_bottom=10,
+            margin_end=10,
+            margin_start=10,
+            margin_top=10,
+            wrap=True,
+            xalign=0,
+        )
+        screenshot = self.get_image(appimage_io_url, name, token)
 
-            description = item.get("description", "")
-            if not selected_category or (
-                selected_category and selected_category in categories
-            ):
-                links = item["links"]
-
-                if links is None:
-                    continue
-                download_url = ""
-                for link in links:
-                    if link["type"] == "Download":
-                        download_url = link["url"]
-                        break
-
-                appimage_row = Adw.ExpanderRow(title=name, subtitle=authors_name)
-                download_button = Gtk.Button(
-                    label="Github Release",
-                    margin_bottom=10,
-                    margin_end=10,
-                    margin_start=10,
-                    margin_top=10,
-                    css_classes=["suggested-action"],
-                )
-                download_button.connect(
-                    "clicked", self.on_download_clicked, download_url
-                )
-
-                info_box = Gtk.Box(
-                    orientation=Gtk.Orientation.VERTICAL,
-                    margin_bottom=10,
-                    margin_end=10,
-                    margin_start=10,
-                    margin_top=10,
-                    spacing=10,
-                )
-                author_label = Gtk.Label(
-                    label=f'Author: <a href="{authors_url}">{authors_name}</a>',
-                    margin_bottom=10,
-                    margin_end=10,
-                    margin_start=10,
-                    margin_top=10,
-                    wrap=True,
-                    xalign=0,
-                    use_markup=True,
-                )
-                license_label = Gtk.Label(
-                    label=f"License: {license}",
-                    margin_bottom=10,
-                    margin_end=10,
-                    margin_start=10,
-                    margin_top=10,
-                    wrap=True,
-                    xalign=0,
-                )
-                description_label = Gtk.Label(
-                    label=f"Description: {description}",
-                    margin_bottom=10,
-                    margin_end=10,
-                    margin_start=10,
-                    margin_top=10,
-                    wrap=True,
-                    xalign=0,
-                )
-
-                info_box.append(download_button)
-                info_box.append(author_label)
-                info_box.append(license_label)
-                info_box.append(description_label)
-                info_box.append(screenshot)
-
-                appimage_row.add_row(info_box)
-
-                appimage_row.add_prefix(icon)
-                self.ui.download_app_group.add(appimage_row)
-                self.download_app_rows.append(appimage_row)
-
-                appimages_count += 1
-
-    def get_icon(self, appimage_io_url, item):
-        """
-        Gets the icon.
+        info_box.append(button_box)
+        info_box.append(progress_bar)
+        info_box.append(author_label)
+        info_box.append(license_label)
+        info_box.append(description_label)
+        info_box.append(screenshot)
+        return info_box
+
+    def get_icon(self, appimage_row, appimage_io_url, item):
+        """
+        Gets the icon of an item into a download row.
 
+        :param appimage_row: The row to show the icon in.
         :param appimage_io_url: The appimage.io url.
-        :param item: The item to get the icon for.
-        :return: The icon.
-        """
-        icon_name = item.get("icons", "")
-        icon_name = icon_name[0] if icon_name and len(icon_name) > 0 else None
-        icon_url = appimage_io_url + "/" + icon_name if icon_name else None
-
-        icon = Gtk.Image()
-        icon.set_pixel_size(50)
-        icon.set_from_icon_name("image-missing")
-        icon.set_halign(Gtk.Align.CENTER)
-        icon.set_valign(Gtk.Align.CENTER)
-        icon.set_margin_bottom(10)
-        icon.set_margin_end(10)
-        icon.set_margin_start(10)
-        icon.set_margin_top(10)
-
-        if icon_url is not None:
-            thread = threading.Thread(
-                target=self.fetch_icon, args=(icon, icon_url), daemon=True
-            )
-            thread.start()
+        :param item: The CatalogEntry to get the icon for.
+        """
+        icon_url = appimage_io_url + "/" + item.icon if item.icon else None
+
+        if icon_url is None:
+            appimage_row.icon.set_from_icon_name("image-missing")
+            return
+
+        # Icons are decoded for the device pixels they cover on HiDPI screens
+        size = ICON_SIZE * appimage_row.get_scale_factor()
+        texture = self.texture_cache.get(icon_url, size)
+        if texture is not None:
+            appimage_row.icon.set_from_paintable(texture)
+            return
+
+        appimage_row.icon.set_from_icon_name("image-missing")
+        token = appimage_row.token
+        self.fetch_pool.submit(
+            self.fetch_icon,
+            appimage_row,
+            icon_url,
+            size,
+            token,
+            token=token,
+            priority=self.row_distance(appimage_row),
+        )
+
+    def on_scroll(self, adjustment):
+        """
+        Schedules an update of the fetch priorities when the list is scrolled.
+
+        :param adjustment: The vertical adjustment of the download window.
+        """
+        if self.scroll_timeout is None:
+            self.scroll_timeout = GLib.timeout_add(SCROLL_DELAY, self.on_scroll_timeout)
+
+    def on_scroll_timeout(self):
+        """
+        Requeues the pending image fetches by the new distance of their rows to the
+        viewport, drops the ones of rows that are far away, and fetches again
+        the dropped icons of rows that came back near the viewport.
+        """
+        self.scroll_timeout = None
+        heights = [
+            appimage_row.get_height()
+            for appimage_row in self.bound_rows.values()
+            if not appimage_row.get_expanded() and appimage_row.get_height() > 0
+        ]
+        if heights:
+            self.row_height = min(heights)
+
+        for token in self.fetch_pool.reprioritize(self.job_priority):
+            appimage_row = self.bound_rows.get(token)
+            if appimage_row is not None:
+                appimage_row.icon_dropped = True
+
+        for appimage_row in list(self.bound_rows.values()):
+            if (
+                appimage_row.icon_dropped
+                and self.row_distance(appimage_row) <= DROP_ROWS
+            ):
+                appimage_row.icon_dropped = False
+                self.get_icon(appimage_row, APPIMAGE_IO_URL, appimage_row.item)
+        return False
 
-        return icon
+    def row_distance(self, appimage_row):
+        """
+        Estimates how far a row is from the viewport.
+
+        :param appimage_row: The row.
+        :return: The number of rows between the row and the viewport, 0 if it is visible.
+        """
+        adjustment = self.ui.download_window.get_vadjustment()
+        start = adjustment.get_value()
+        end = start + adjustment.get_page_size()
+        top = appimage_row.list_item.get_position() * self.row_height
+        bottom = top + self.row_height
+        if bottom <= start:
+            return int((start - bottom) // self.row_height) + 1
+        if top >= end:
+            return int((top - end) // self.row_height) + 1
+        return 0
+
+    def job_priority(self, token):
+        """
+        Gets the priority of a pending image fetch.
 
-    def fetch_icon(self, icon, icon_url):
+        :param token: The CancelToken of the row binding.
+        :return: The distance of the row to the viewport, or None to drop the fetch.
+        """
+        appimage_row = self.bound_rows.get(token)
+        if appimage_row is None:
+            return None
+        distance = self.row_distance(appimage_row)
+        # The screenshot of an expanded row was asked for, it is never dropped
+        if distance > DROP_ROWS and not appimage_row.get_expanded():
+            return None
+        return distance
+
+    def fetch_icon(self, appimage_row, icon_url, size, token):
         """
         Fetches the icon.
 
-        :param icon: The icon object.
+        :param appimage_row: The row the icon was requested for.
         :param icon_url: The icon url.
+        :param size: The size to decode the icon at, in device pixels.
+        :param token: The CancelToken of the row binding.
         """
         try:
-            response = requests.get(icon_url)
-            if response.status_code == 200:
-                loader = GdkPixbuf.PixbufLoader()
-                loader.write(response.content)
-                loader.close()
-                pixbuf = loader.get_pixbuf()
-                if pixbuf is not None:
-                    pixbuf = pixbuf.scale_simple(
-                        300, 300, GdkPixbuf.InterpType.BILINEAR
-                    )
-                    GLib.idle_add(self.set_icon, icon, pixbuf)
+            content = self.read_image(icon_url, token)
+            if content is not None and not token.is_cancelled():
+                texture = self.decode_texture(content, size)
+                if texture is not None:
+                    self.texture_cache.put(icon_url, size, texture)
+                    GLib.idle_add(self.set_icon, appimage_row, token, texture)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching image: {e}")
-            GLib.idle_add(self.set_icon, icon, None)
+            GLib.idle_add(self.set_icon, appimage_row, token, None)
+
+    def read_image(self, url, token):
+        """
+        Reads an image from the catalog bundle, or else from the image cache.
+        A bundle is meant for machines without network, so an image missing
+        from it is only looked for on the disk.
+
+        :param url: The url of the image.
+        :param token: The CancelToken of the row binding.
+        :return: The bytes of the image, or None if it could not be fetched.
+        """
+        if self.bundle is not None:
+            content = self.bundle.read_image(url)
+            if content is None:
+                content = self.image_cache.peek(url)
+            return content
+        return self.image_cache.fetch(url, self.fetch_pool, token)
+
+    def decode_texture(self, content, size):
+        """
+        Decodes an image straight at the size it is shown at.
+        Vector images are rasterised once at that size.
+
+        :param content: The bytes of the image.
+        :param size: The largest side of the decoded image, in device pixels.
+        :return: The texture, or None if the image could not be decoded.
+        """
+        loader = GdkPixbuf.PixbufLoader()
+        loader.connect("size-prepared", self.on_size_prepared, size)
+        try:
+            loader.write(content)
+            loader.close()
+        except GLib.Error as error:
+            print(f"Error decoding image: {error.message}")
+            return None
+        pixbuf = loader.get_pixbuf()
+        if pixbuf is None:
+            return None
+        return Gdk.Texture.new_for_pixbuf(pixbuf)
+
+    def on_size_prepared(self, loader, width, height, size):
+        """
+        Asks the loader to scale the image to the display size while decoding.
+        Bitmaps are only scaled down, vector images are also rasterised larger
+        than their intrinsic size, so that GTK does not upscale them blurry.
 
-    def set_icon(self, icon, pixbuf):
+        :param loader: The pixbuf loader.
+        :param width: The width of the image.
+        :param height: The height of the image.
+        :param size: The largest side of the decoded image, in device pixels.
         """
-        Sets the icon.
+        image_format = loader.get_format()
+        scalable = image_format is not None and image_format.is_scalable()
+        if width <= size and height <= size and not scalable:
+            return
+        if max(width, height) == size:
+            return
+        factor = size / max(width, height)
+        loader.set_size(max(1, round(width * factor)), max(1, round(height * factor)))
 
-        :param icon: The icon object.
-        :param pixbuf: The pixbuf object.
+    def set_icon(self, appimage_row, token, texture):
         """
-        if pixbuf is not None:
-            icon.set_from_pixbuf(pixbuf)
+        Sets the icon, unless the row was bound to another item meanwhile.
+
+        :param appimage_row: The row the icon was requested for.
+        :param token: The CancelToken of the row binding.
+        :param texture: The texture object.
+        """
+        if token.is_cancelled():
+            return
+        if texture is not None:
+            appimage_row.icon.set_from_paintable(texture)
 
         else:
-            icon.set_from_icon_name("image-missing")
+            appimage_row.icon.set_from_icon_name("image-missing")
 
-    def get_image(self, appimage_url, name):
+    def get_image(self, appimage_url, name, token):
         """
         Gets the image.
 
         :param appimage_url: The appimage url.
         :param name: The name of the appimage.
+        :param token: The CancelToken of the row binding.
         :return: The image.
         """
         screenshot_url = appimage_url + "/" + name + "/screenshot.png"
 
         screenshot = Gtk.Image()
-        screenshot.set_pixel_size(400)
-        screenshot.set_from_icon_name("image-missing")
+        screenshot.set_pixel_size(SCREENSHOT_SIZE)
 
-        thread = threading.Thread(
-            target=self.fetch_image, args=(screenshot, screenshot_url), daemon=True
+        size = SCREENSHOT_SIZE * self.ui.win.get_scale_factor()
+        texture = self.texture_cache.get(screenshot_url, size)
+        if texture is not None:
+            screenshot.set_from_paintable(texture)
+            return screenshot
+
+        screenshot.set_from_icon_name("image-missing")
+        appimage_row = self.bound_rows.get(token)
+        self.fetch_pool.submit(
+            self.fetch_image,
+            screenshot,
+            screenshot_url,
+            size,
+            token,
+            token=token,
+            priority=0 if appimage_row is None else self.row_distance(appimage_row),
         )
-        thread.start()
 
         return screenshot
 
-    def fetch_image(self, screenshot, screenshot_url):
+    def fetch_image(self, screenshot, screenshot_url, size, token):
         """
         Fetches the image.
 
         :param screenshot: The screenshot object.
         :param screenshot_url: The screenshot url.
+        :param size: The size to decode the image at, in device pixels.
+        :param token: The CancelToken of the row binding.
         """
         try:
-            response = requests.get(screenshot_url)
-            if response.status_code == 200:
-                loader = GdkPixbuf.PixbufLoader()
-                loader.write(response.content)
-                loader.close()
-                pixbuf = loader.get_pixbuf()
-                if pixbuf is not None:
-                    GLib.idle_add(self.set_image, screenshot, pixbuf)
+            content = self.read_image(screenshot_url, token)
+            if content is not None and not token.is_cancelled():
+                texture = self.decode_texture(content, size)
+                if texture is not None:
+                    self.texture_cache.put(screenshot_url, size, texture)
+                    GLib.idle_add(self.set_image, screenshot, texture)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching image: {e}")
             GLib.idle_add(self.set_image, screenshot, None)
 
-    def set_image(self, screenshot, pixbuf):
+    def set_image(self, screenshot, texture):
         """
         Sets the image.
 
         :param screenshot: The screenshot object.
-        :param pixbuf: The pixbuf object.
+        :param texture: The texture object.
         """
-        if pixbuf is not None:
-            screenshot.set_from_pixbuf(pixbuf)
+        if texture is not None:
+            screenshot.set_from_paintable(texture)
         else:
             screenshot.set_from_icon_name("image-missing")
 
@@ -396,3 +1250,108 @@ class Download_Page(Adw.Application):
         :param download_url: The download url.
         """
         Gio.AppInfo.launch_default_for_uri(download_url, None)
+
+    def on_install_clicked(self, button, item):
+        """
+        Starts installing the AppImage of an item into the portable home.
+
+        :param button: The install button object.
+        :param item: The CatalogEntry to install.
+        """
+        progress = self.downloads.get(item.name)
+        if progress is not None and progress[2]:
+            return
+        portable_home_path = self.home_page.portable_home_path
+        if not os.path.isdir(portable_home_path):
+            self.ui.show_toast("Set the portable home first", 3000)
+            return
+        self.downloads[item.name] = (None, "Looking for the AppImage", True)
+        self.show_download_progress(item.name)
+        thread = threading.Thread(
+            target=self.install_appimage,
+            args=(item, portable_home_path),
+            daemon=True,
+        )
+        thread.start()
+
+    def install_appimage(self, item, portable_home_path):
+        """
+        Streams the AppImage of an item into the portable home, in segments
+        over several connections, then registers it on the home page.
+
+        :param item: The CatalogEntry to install.
+        :param portable_home_path: The path to the portable home directory.
+        """
+        name = item.name
+        try:
+            url, tag = resolve_appimage(item.download_url)
+
+            def on_progress(done, total, speed, eta):
+                fraction = done / total if total else None
+                text = format_progress(done, total, speed, eta)
+                GLib.idle_add(self.update_download, name, fraction, text, True)
+
+            install = Install(
+                url,
+                portable_home_path,
+                app_name(name),
+                tag,
+                segments=self.download_segments,
+                on_progress=on_progress,
+            )
+            install.run()
+            GLib.idle_add(self.finish_install, name, install.name, portable_home_path)
+        except (requests.exceptions.RequestException, ValueError, OSError) as e:
+            print(f"Error installing AppImage: {e}")
+            GLib.idle_add(
+                self.update_download, name, 0.0, f"Install failed: {e}", False
+            )
+
+    def finish_install(self, name, appimage_name, portable_home_path):
+        """
+        Adds an installed AppImage to the home page.
+
+        :param name: The name of the catalog entry.
+        :param appimage_name: The name of the app in the portable home.
+        :param portable_home_path: The path to the portable home directory.
+        """
+        # The config is only written once, the install already made the folders
+        if portable_home_path == self.home_page.portable_home_path:
+            self.home_page.save_appimage_list_to_config(appimage_name)
+            self.home_page.create_appimage_row(appimage_name, portable_home_path)
+        self.update_download(name, 1.0, f"Installed {appimage_name}", False)
+        self.ui.show_toast(appimage_name + " installed", 3000)
+        return False
+
+    def update_download(self, name, fraction, text, running):
+        """
+        Records the progress of a download and shows it in its row.
+
+        :param name: The name of the AppImage.
+        :param fraction: The fraction done, or None if the size is unknown.
+        :param text: The progress text.
+        :param running: False once the download ended.
+        """
+        self.downloads[name] = (fraction, text, running)
+        self.show_download_progress(name)
+        return False
+
+    def show_download_progress(self, name):
+        """
+        Shows the progress of a download in the row of its AppImage, if any.
+
+        :param name: The name of the AppImage.
+        """
+        widgets = self.download_widgets.get(name)
+        progress = self.downloads.get(name)
+        if widgets is None or progress is None:
+            return
+        get_button, progress_bar = widgets
+        fraction, text, running = progress
+        get_button.set_sensitive(not running)
+        progress_bar.set_visible(True)
+        if fraction is None:
+            progress_bar.pulse()
+        else:
+            progress_bar.set_fraction(fraction)
+        progress_bar.set_text(text)
@@ -0,0 +1,469 @@
+import os
+import json
+import time
+import hashlib
+import platform
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+import requests
+
+from http_session import TIMEOUT, shared_session
+
+CHUNK_SIZE = 256 * 1024
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024  # smaller files are fetched in fewer segments
+SEGMENT_RETRIES = 3
+RETRY_DELAY = 1  # seconds, doubled on each retry
+PROGRESS_INTERVAL = 0.5  # seconds between two progress reports
+STATE_INTERVAL = 2  # seconds between two saves of the resume state
+SPEED_WINDOW = 5  # seconds of progress the throughput is averaged over
+GITHUB_API_URL = "https://api.github.com/repos/{owner}/{repo}/releases/{release}"
+
+# Names the architectures are given in AppImage file names
+ARCH_ALIASES = {
+    "x86_64": ("x86_64", "amd64", "x64"),
+    "aarch64": ("aarch64", "arm64"),
+    "armv7l": ("armhf", "armv7"),
+    "i686": ("i386", "i686"),
+}
+
+
+class SourceChanged(Exception):
+    """
+    Raised when the file changed on the server since the download started.
+    """
+
+
+def resolve_appimage(url, session=None):
+    """
+    Turns the download url of a catalog entry into the url of an AppImage.
+    GitHub release pages are resolved with the GitHub API, picking the AppImage
+    asset built for this machine.
+
+    :param url: The download url of the catalog entry.
+    :param session: The HTTP session, the shared one by default.
+    :return: The url of the AppImage and the release tag, or None if unknown.
+    :raises requests.exceptions.RequestException: If the API request failed.
+    :raises ValueError: If the release has no AppImage, or if the url is
+        neither a GitHub repository nor a link to an AppImage.
+    """
+    parts = urlsplit(url)
+    path = parts.path.strip("/").split("/")
+    is_appimage = parts.path.lower().endswith(".appimage")
+    if parts.netloc != "github.com" or len(path) < 2:
+        # Other links are usually download pages, which can not be installed
+        if not is_appimage:
+            raise ValueError(f"{url} is not a link to an AppImage")
+        return url, None
+    if len(path) >= 4 and path[2] == "releases" and path[3] == "download":
+        if not is_appimage:
+            raise ValueError(f"{url} is not a link to an AppImage")
+        return url, path[4] if len(path) > 5 else None
+
+    owner, repo = path[0], path[1]
+    if len(path) >= 5 and path[2] == "releases" and path[3] == "tag":
+        release = "tags/" + path[4]
+    else:
+        release = "latest"
+    session = session or shared_session()
+    response = session.get(
+        GITHUB_API_URL.format(owner=owner, repo=repo, release=release),
+        headers={"Accept": "application/vnd.github+json"},
+        timeout=TIMEOUT,
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    asset = pick_appimage(data.get("assets", []))
+    if asset is None:
+        raise ValueError(f"No AppImage in the release of {owner}/{repo}")
+    return asset["browser_download_url"], data.get("tag_name")
+
+
+def pick_appimage(assets):
+    """
+    Picks the AppImage built for this machine among the assets of a GitHub release.
+
+    :param assets: The assets of the release, as returned by the GitHub API.
+    :return: The asset, or None if the release has no AppImage.
+    """
+    assets = [
+        asset for asset in assets if asset.get("name", "").lower().endswith(".appimage")
+    ]
+    if not assets:
+        return None
+    aliases = ARCH_ALIASES.get(platform.machine(), (platform.machine(),))
+    native = [
+        asset
+        for asset in assets
+        if any(alias in asset["name"].lower() for alias in aliases)
+    ]
+    return (native or assets)[0]
+
+
+def format_size(size):
+    """
+    Formats a number of bytes for display.
+
+    :param size: The number of bytes.
+    :return: The formatted size, such as "12.3 MB".
+    """
+    for unit in ("B", "kB", "MB", "GB"):
+        if size < 1000 or unit == "GB":
+            break
+        size /= 1000
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def format_progress(done, total, speed, eta):
+    """
+    Formats the progress of a download for display.
+
+    :param done: The number of bytes downloaded.
+    :param total: The size of the file, or None if unknown.
+    :param speed: The throughput, in bytes per second.
+    :param eta: The estimated seconds left, or None if unknown.
+    :return: The formatted progress.
+    """
+    text = format_size(done)
+    if total:
+        text += f" of {format_size(total)}"
+    text += f", {format_size(speed)}/s"
+    if eta is not None:
+        minutes, seconds = divmod(int(eta), 60)
+        text += f", {minutes}:{seconds:02d} left"
+    return text
+
+
+class Download:
+    """
+    A download of one large file, split into byte-range segments fetched over
+    several connections. The progress of each segment is saved in a sidecar
+    state file, so an interrupted download resumes where it stopped.
+    Servers without range support are read in a single stream.
+    Each segment is hashed in order as it is written, so the SHA-1 of the file
+    is known without reading it back when it was written as one stream.
+    """
+
+    def __init__(
+        self,
+        url,
+        path,
+        session=None,
+        segments=4,
+        min_segment_size=MIN_SEGMENT_SIZE,
+        on_progress=None,
+        token=None,
+    ) -> None:
+        """
+        Initializes the Download object.
+
+        :param url: The url of the file.
+        :param path: The path the file is written to.
+        :param session: The HTTP session, the shared one by default.
+        :param segments: The number of connections used at once.
+        :param min_segment_size: The smallest segment worth its own connection.
+        :param on_progress: Called with the bytes done, the total size or None,
+            the throughput in bytes per second and the seconds left or None.
+            It is called from the thread running the download.
+        :param token: A CancelToken, the download stops once it is cancelled.
+        """
+        self.url = url
+        self.path = path
+        self.state_path = path + ".state"
+        self.session = session or shared_session()
+        self.segments = max(1, segments)
+        self.min_segment_size = min_segment_size
+        self.on_progress = on_progress
+        self.token = token
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.done = 0
+        self.total = None
+        self.samples = deque()
+        self.reported = 0
+        self.hashes = {}  # segment start -> SHA-1 of what this run wrote of it
+        self.sha1 = None
+        self.segment_sha1s = None
+
+    def run(self):
+        """
+        Downloads the file, resuming a previous attempt if there is one.
+
+        Once complete, sha1 holds the SHA-1 of the file if it was hashed whole,
+        and segment_sha1s the [start, end, SHA-1] of each segment, the SHA-1
+        being None for a segment partly written by an earlier run.
+
+        :return: True if the file is complete, False if the download was cancelled.
+        :raises requests.exceptions.RequestException: If the download failed,
+            the state is kept so that it can be resumed.
+        :raises OSError: If the file could not be written.
+        """
+        state = self.load_state()
+        try:
+            if state is None:
+                return self.start()
+            return self.fetch_segments(state)
+        except SourceChanged:
+            # The partial file is useless, start over once
+            self.remove_state()
+            return self.start()
+
+    def start(self):
+        """
+        Probes the server for range support, then downloads the file from scratch.
+
+        :return: True if the file is complete, False if the download was cancelled.
+        """
+        self.stop.clear()
+        self.done = 0
+        self.hashes = {}
+        response = self.session.get(
+            self.url, headers={"Range": "bytes=0-0"}, timeout=TIMEOUT, stream=True
+        )
+        with response:
+            response.raise_for_status()
+            total = self.content_range_total(response)
+            if response.status_code != 206 or total is None:
+                # No ranges, the probe already is the whole body
+                return self.stream(response)
+            # A weak ETag can not be used in If-Range
+            validator = response.headers.get("ETag")
+            if validator is None or validator.startswith("W/"):
+                validator = response.headers.get("Last-Modified")
+
+        count = max(1, min(self.segments, total // self.min_segment_size))
+        bounds = [total * index // count for index in range(count + 1)]
+        state = {
+            "url": self.url,
+            "size": total,
+            "validator": validator,
+            "segments": [[bounds[i], bounds[i + 1], bounds[i]] for i in range(count)],
+        }
+        with open(self.path, "wb") as f:
+            f.truncate(total)
+        self.save_state(state)
+        return self.fetch_segments(state)
+
+    def stream(self, response):
+        """
+        Downloads the file in a single stream, when the server has no range support.
+
+        :param response: The response with the whole body.
+        :return: True if the file is complete, False if the download was cancelled.
+        """
+        length = response.headers.get("Content-Length")
+        if length and not response.headers.get("Content-Encoding"):
+            self.total = int(length)
+        sha1 = hashlib.sha1()
+        with open(self.path, "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if self.cancelled():
+                    return False
+                f.write(chunk)
+                sha1.update(chunk)
+                self.done += len(chunk)
+                self.report()
+        self.report(force=True)
+        self.sha1 = sha1.hexdigest()
+        return True
+
+    def fetch_segments(self, state):
+        """
+        Downloads the missing part of every segment, in parallel.
+
+        :param state: The resume state, updated as the segments progress.
+        :return: True if the file is complete, False if the download was cancelled.
+        """
+        self.total = state["size"]
+        self.done = sum(position - start for start, end, position in state["segments"])
+        pending = [segment for segment in state["segments"] if segment[2] < segment[1]]
+        for start, end, position in pending:
+            # What an earlier run wrote is not read back, so it stays unhashed
+            if position == start:
+                self.hashes.setdefault(start, hashlib.sha1())
+
+        fd = os.open(self.path, os.O_WRONLY)
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max(1, len(pending)), thread_name_prefix="download"
+            ) as executor:
+                futures = [
+                    executor.submit(self.fetch_segment, fd, state, segment)
+                    for segment in pending
+                ]
+                saved = time.monotonic()
+                while True:
+                    finished, running = wait(futures, timeout=PROGRESS_INTERVAL)
+                    if any(future.exception() for future in finished):
+                        # One segment failed for good, the others stop too
+                        self.stop.set()
+                    self.report()
+                    if not running:
+                        break
+                    if time.monotonic() - saved >= STATE_INTERVAL:
+                        self.save_state(state)
+                        saved = time.monotonic()
+        finally:
+            os.close(fd)
+
+        for future in futures:
+            if future.exception() is not None:
+                if not isinstance(future.exception(), SourceChanged):
+                    self.save_state(state)
+                raise future.exception()
+        if self.cancelled():
+            self.save_state(state)
+            return False
+        self.report(force=True)
+        self.remove_state()
+        self.segment_sha1s = [
+            [
+                start,
+                end,
+                self.hashes[start].hexdigest() if start in self.hashes else None,
+            ]
+            for start, end, position in state["segments"]
+        ]
+        if len(self.segment_sha1s) == 1:
+            self.sha1 = self.segment_sha1s[0][2]
+        return True
+
+    def fetch_segment(self, fd, state, segment):
+        """
+        Downloads the rest of one segment, retrying from where a failed try stopped.
+
+        :param fd: The file descriptor of the file.
+        :param state: The resume state.
+        :param segment: The [start, end, position] list of the segment.
+        :raises SourceChanged: If the file changed on the server.
+        """
+        attempt = 0
+        while segment[2] < segment[1]:
+            if self.cancelled():
+                return
+            position = segment[2]
+            headers = {"Range": f"bytes={segment[2]}-{segment[1] - 1}"}
+            if state["validator"]:
+                headers["If-Range"] = state["validator"]
+            try:
+                response = self.session.get(
+                    self.url, headers=headers, timeout=TIMEOUT, stream=True
+                )
+                with response:
+                    if response.status_code == 200:
+                        raise SourceChanged(f"{self.url} changed on the server")
+                    response.raise_for_status()
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        if self.cancelled():
+                            return
+                        chunk = chunk[: segment[1] - segment[2]]
+                        os.pwrite(fd, chunk, segment[2])
+                        # Only this thread writes the segment, always in order
+                        if segment[0] in self.hashes:
+                            self.hashes[segment[0]].update(chunk)
+                        with self.lock:
+                            segment[2] += len(chunk)
+                            self.done += len(chunk)
+                        if segment[2] >= segment[1]:
+                            break
+            except requests.exceptions.RequestException:
+                if segment[2] == position and attempt >= SEGMENT_RETRIES:
+                    raise
+            else:
+                # The body ended early without any data, give up after a few tries
+                if segment[2] == position and attempt >= SEGMENT_RETRIES:
+                    raise requests.exceptions.ConnectionError(f"{self.url} ended early")
+            if segment[2] > position:
+                # The try made progress, go on from where it stopped
+                attempt = 0
+                continue
+            time.sleep(RETRY_DELAY * (2**attempt))
+            attempt += 1
+
+    def cancelled(self):
+        """
+        Checks if the download has to stop.
+
+        :return: True if it was cancelled or another segment failed.
+        """
+        return self.stop.is_set() or (
+            self.token is not None and self.token.is_cancelled()
+        )
+
+    def report(self, force=False):
+        """
+        Reports the progress, at most every PROGRESS_INTERVAL.
+
+        :param force: Report even if the last report is recent.
+        """
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.reported < PROGRESS_INTERVAL:
+            return
+        self.reported = now
+        done = self.done
+        self.samples.append((now, done))
+        while now - self.samples[0][0] > SPEED_WINDOW:
+            self.samples.popleft()
+        start, start_done = self.samples[0]
+        speed = (done - start_done) / (now - start) if now > start else 0
+        eta = (self.total - done) / speed if self.total and speed else None
+        self.on_progress(done, self.total, speed, eta)
+
+    def content_range_total(self, response):
+        """
+        Reads the size of the file from the Content-Range header of a response.
+
+        :param response: The response to a range request.
+        :return: The size, or None if the header is missing or has no size.
+        """
+        value = response.headers.get("Content-Range", "")
+        total = value.rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+
+    def load_state(self):
+        """
+        Loads the state of an interrupted download of the same url.
+
+        :return: The state, or None if there is nothing to resume.
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != self.url or os.path.getsize(self.path) != state.get(
+            "size"
+        ):
+            return None
+        return state
+
+    def save_state(self, state):
+        """
+        Saves the resume state next to the file.
+
+        :param state: The state.
+        """
+        with self.lock:
+            content = json.dumps(state)
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Error saving download state: {e}")
+
+    def remove_state(self):
+        """
+        Removes the resume state.
+        """
+        try:
+            os.remove(self.state_path)
+        except FileNotFoundError:
+            pass
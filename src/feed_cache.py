@@ -0,0 +1,137 @@
+import os
+import json
+import requests
+
+from catalog import parse_entries
+from http_session import TIMEOUT, shared_session
+
+FEED_URL = "https://appimage.github.io/feed.json"
+CACHE_DIR = os.path.expanduser("~/.cache/AppsToGo")
+READ_SIZE = 64 * 1024
+
+
+class FeedCache:
+    """
+    Keeps a copy of the appimage.github.io feed.json on disk.
+    The cached copy is used to show the catalog straight away, and is then
+    revalidated with a conditional request (ETag / If-Modified-Since).
+    """
+
+    def __init__(self, url=FEED_URL, cache_dir=CACHE_DIR) -> None:
+        """
+        Initializes the FeedCache object.
+
+        :param url: The url of the feed.
+        :param cache_dir: The directory where the feed is cached.
+        """
+        self.url = url
+        self.cache_dir = cache_dir
+        self.feed_file = os.path.join(cache_dir, "feed.json")
+        self.meta_file = os.path.join(cache_dir, "feed.meta.json")
+
+    def load(self, on_chunk=None):
+        """
+        Loads the cached feed from disk, parsing it as it is read.
+
+        :param on_chunk: Called with the list of entries parsed so far,
+            every CHUNK_ITEMS entries.
+        :return: A list of CatalogEntry, or None if there is no usable copy.
+        """
+        try:
+            with open(self.feed_file, "rb") as f:
+                return parse_entries(iter(lambda: f.read(READ_SIZE), b""), on_chunk)
+        except (OSError, ValueError):
+            return None
+
+    def load_meta(self):
+        """
+        Loads the validators (ETag / Last-Modified) of the cached feed.
+
+        :return: A dict with the validators, empty if there are none.
+        """
+        if not os.path.exists(self.feed_file):
+            return {}
+        try:
+            with open(self.meta_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def revalidate(self, on_chunk=None, conditional=True):
+        """
+        Asks the server if the feed changed since it was cached.
+        A new feed is streamed to the cache directory and parsed as it arrives.
+
+        :param on_chunk: Called with the list of entries parsed so far,
+            every CHUNK_ITEMS entries.
+        :param conditional: False to always get the feed, such as when the
+            cached copy could not be loaded and a 304 would leave nothing to show.
+        :return: A list of CatalogEntry if the server answered 200, otherwise None.
+        """
+        meta = self.load_meta() if conditional else {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        tmp_path = self.feed_file + ".tmp"
+        try:
+            response = shared_session().get(
+                self.url, headers=headers, timeout=TIMEOUT, stream=True
+            )
+            with response:
+                if response.status_code != 200:
+                    return None
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    entries = parse_entries(
+                        self.tee(response.iter_content(READ_SIZE), f), on_chunk
+                    )
+                os.replace(tmp_path, self.feed_file)
+                self.write_atomic(
+                    self.meta_file,
+                    json.dumps(
+                        {
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                        }
+                    ).encode(),
+                )
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching feed: {e}")
+            return None
+        except ValueError as e:
+            print(f"Error parsing feed: {e}")
+            return None
+        except OSError as e:
+            print(f"Error saving feed cache: {e}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return entries
+
+    def tee(self, chunks, f):
+        """
+        Writes chunks to a file while passing them on.
+
+        :param chunks: The chunks of the body.
+        :param f: The file to write to.
+        :return: A generator of the same chunks.
+        """
+        for chunk in chunks:
+            f.write(chunk)
+            yield chunk
+
+    def write_atomic(self, path, content):
+        """
+        Writes a file so that readers never see a half written copy.
+
+        :param path: The path of the file.
+        :param content: The bytes to write.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
@@ -0,0 +1,169 @@
+import re
+import json
+import codecs
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER_END = ",}] \t\n\r"
+
+# States of the parser
+START = 0
+KEY = 1
+COLON = 2
+VALUE = 3
+ITEMS = 4
+ITEM = 5
+DONE = 6
+
+
+class FeedParser:
+    """
+    An incremental parser for feed.json. It is fed the body chunk by chunk and
+    returns each object of the top level "items" array as soon as it is complete,
+    so neither the whole body nor the whole parsed tree has to be kept in memory.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes the FeedParser object.
+        """
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.state = START
+        self.key = None
+
+    def feed(self, data):
+        """
+        Feeds a chunk of the body to the parser.
+
+        :param data: The bytes of the chunk.
+        :return: A list with the items completed by this chunk.
+        :raises ValueError: If the body is not a valid feed.
+        """
+        self.buffer += self.text_decoder.decode(data)
+        return self.parse(final=False)
+
+    def close(self):
+        """
+        Tells the parser the body is complete.
+
+        :return: A list with the last items.
+        :raises ValueError: If the body ended before the feed was complete.
+        """
+        self.buffer += self.text_decoder.decode(b"", final=True)
+        items = self.parse(final=True)
+        if self.state != DONE:
+            raise ValueError("Truncated feed")
+        return items
+
+    def parse(self, final):
+        """
+        Parses as much of the buffer as possible.
+
+        :param final: True if no more data will be fed.
+        :return: A list with the completed items.
+        """
+        items = []
+        buffer = self.buffer
+        pos = 0
+        while True:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            char = buffer[pos]
+
+            if self.state == START:
+                if char != "{":
+                    raise ValueError("The feed is not a JSON object")
+                pos += 1
+                self.state = KEY
+            elif self.state == KEY:
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "}":
+                    pos += 1
+                    self.state = DONE
+                    continue
+                value, end = self.decode(buffer, pos, final)
+                if end is None:
+                    break
+                self.key = value
+                pos = end
+                self.state = COLON
+            elif self.state == COLON:
+                if char != ":":
+                    raise ValueError("Expected ':' in the feed")
+                pos += 1
+                self.state = ITEMS if self.key == "items" else VALUE
+            elif self.state == VALUE:
+                value, end = self.decode(buffer, pos, final)
+                if end is None:
+                    break
+                pos = end
+                self.state = KEY
+            elif self.state == ITEMS:
+                if char != "[":
+                    raise ValueError("The feed items are not a list")
+                pos += 1
+                self.state = ITEM
+            elif self.state == ITEM:
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "]":
+                    pos += 1
+                    self.state = KEY
+                    continue
+                value, end = self.decode(buffer, pos, final)
+                if end is None:
+                    break
+                if isinstance(value, dict):
+                    items.append(value)
+                pos = end
+            else:
+                raise ValueError("Extra data after the feed")
+
+        self.buffer = buffer[pos:]
+        return items
+
+    def decode(self, buffer, pos, final):
+        """
+        Decodes one JSON value of the buffer.
+
+        :param buffer: The buffer.
+        :param pos: The position of the value.
+        :param final: True if no more data will be fed.
+        :return: The value and the position after it, or (None, None)
+            if more data is needed.
+        :raises ValueError: If the value is invalid and no more data will be fed.
+        """
+        try:
+            value, end = self.decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None, None
+        # A number is only complete once it is followed by a delimiter,
+        # otherwise it may go on in the next chunk
+        if (
+            not final
+            and isinstance(value, (int, float))
+            and (end == len(buffer) or buffer[end] not in NUMBER_END)
+        ):
+            return None, None
+        return value, end
+
+
+def iter_items(chunks):
+    """
+    Parses feed.json from an iterable of byte chunks.
+
+    :param chunks: The chunks of the body.
+    :return: A generator of the items of the feed.
+    :raises ValueError: If the body is not a valid feed.
+    """
+    parser = FeedParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -0,0 +1,252 @@
+import time
+import heapq
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+
+from http_session import TIMEOUT, shared_session
+from settings import load_settings
+
+# Status codes worth trying again, everything else is final
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 60
+
+
+class CancelToken:
+    """
+    A flag shared by a load and the work it started, set once the load is outdated
+    so that pending work can stop early and late results can be dropped.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes the CancelToken object.
+        """
+        self.event = threading.Event()
+
+    def cancel(self):
+        """
+        Marks the load as outdated.
+        """
+        self.event.set()
+
+    def is_cancelled(self):
+        """
+        Checks if the load is outdated.
+
+        :return: True if the load was cancelled.
+        """
+        return self.event.is_set()
+
+
+class FetchPool:
+    """
+    A shared pool of worker threads for the catalog icon and screenshot fetches.
+    It caps the number of requests in flight, both in total and per host,
+    and retries failed requests with exponential backoff.
+    Jobs submitted with a priority wait in a queue, lowest priority first,
+    and their priorities can be updated or the jobs dropped while they wait.
+    """
+
+    def __init__(
+        self, session, max_workers=8, per_host=4, retries=3, backoff=0.5
+    ) -> None:
+        """
+        Initializes the FetchPool object.
+
+        :param session: The HTTP session used for the requests.
+        :param max_workers: The number of worker threads.
+        :param per_host: The number of requests in flight per host.
+        :param retries: How many times a failed request is tried again.
+        :param backoff: The delay before the first retry, in seconds.
+        """
+        self.session = session
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="fetch"
+        )
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.host_slots = {}
+        self.queue = []
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, token=None, priority=None):
+        """
+        Runs a function on one of the worker threads.
+
+        :param fn: The function to run.
+        :param args: The arguments of the function.
+        :param token: A CancelToken, the call is skipped if it is cancelled
+            before a worker picks it up.
+        :param priority: If not None, the call waits in the priority queue
+            and runs before the calls with a higher priority.
+        :return: The future of the call.
+        """
+        if priority is None:
+            return self.executor.submit(self.run, fn, args, token)
+
+        future = Future()
+        with self.lock:
+            self.sequence += 1
+            heapq.heappush(
+                self.queue, (priority, self.sequence, (fn, args, token, future))
+            )
+        # Each worker task runs whichever queued call is first when it starts
+        self.executor.submit(self.run_next)
+        return future
+
+    def run_next(self):
+        """
+        Runs the queued call with the lowest priority.
+        """
+        with self.lock:
+            if not self.queue:
+                return
+            priority, sequence, job = heapq.heappop(self.queue)
+        fn, args, token, future = job
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.run(fn, args, token)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def reprioritize(self, priority_of):
+        """
+        Updates the priorities of the queued calls, dropping the ones that
+        are not wanted any more.
+
+        :param priority_of: Called with the token of each queued call,
+            returns its new priority, or None to drop it.
+        :return: The tokens of the dropped calls.
+        """
+        dropped = []
+        with self.lock:
+            queue = []
+            for priority, sequence, job in self.queue:
+                token = job[2]
+                if token is not None and token.is_cancelled():
+                    priority = None
+                elif token is not None:
+                    priority = priority_of(token)
+                if priority is None:
+                    job[3].cancel()
+                    dropped.append(token)
+                else:
+                    queue.append((priority, sequence, job))
+            heapq.heapify(queue)
+            self.queue = queue
+        return dropped
+
+    def run(self, fn, args, token):
+        """
+        Runs a submitted function, unless its token was cancelled meanwhile.
+
+        :param fn: The function to run.
+        :param args: The arguments of the function.
+        :param token: The CancelToken of the call, or None.
+        :return: The result of the function.
+        """
+        if token is not None and token.is_cancelled():
+            return None
+        return fn(*args)
+
+    def get(self, url, token=None, **kwargs):
+        """
+        Fetches an url, waiting for a free slot on its host and retrying on failure.
+
+        :param url: The url to fetch.
+        :param token: A CancelToken, no new try is made once it is cancelled.
+        :param kwargs: Extra arguments for the session get.
+        :return: The response, or None if the token was cancelled.
+        :raises requests.exceptions.RequestException: If the last try failed.
+        """
+        kwargs.setdefault("timeout", TIMEOUT)
+        slot = self.host_slot(url)
+        attempt = 0
+        while True:
+            delay = None
+            with slot:
+                if token is not None and token.is_cancelled():
+                    return None
+                try:
+                    response = self.session.get(url, **kwargs)
+                except requests.exceptions.RequestException:
+                    if attempt >= self.retries:
+                        raise
+                else:
+                    if (
+                        response.status_code not in RETRY_STATUS
+                        or attempt >= self.retries
+                    ):
+                        return response
+                    delay = self.retry_after(response)
+
+            # Sleep outside of the host slot, so other requests can use it
+            if delay is None:
+                delay = self.backoff * (2**attempt)
+            time.sleep(min(delay, MAX_BACKOFF))
+            attempt += 1
+
+    def host_slot(self, url):
+        """
+        Gets the semaphore that limits the requests in flight to the host of an url.
+
+        :param url: The url.
+        :return: The semaphore of the host.
+        """
+        host = urlsplit(url).netloc
+        with self.lock:
+            slot = self.host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self.host_slots[host] = slot
+            return slot
+
+    def retry_after(self, response):
+        """
+        Reads the Retry-After header of a response.
+
+        :param response: The response.
+        :return: The delay in seconds, or None if the header is missing or invalid.
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        if value.isdigit():
+            return int(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0, retry_at.timestamp() - time.time())
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool():
+    """
+    Gets the fetch pool shared by the whole application, sized from the settings.
+
+    :return: The shared FetchPool.
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            settings = load_settings()
+            _shared_pool = FetchPool(
+                shared_session(),
+                max_workers=settings["fetch_max_workers"],
+                per_host=settings["fetch_per_host"],
+                retries=settings["fetch_retries"],
+                backoff=settings["fetch_backoff"],
+            )
+        return _shared_pool
@@ -2,12 +2,19 @@ import os
 import json
 import shutil
 import subprocess
+import threading
 import gi
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 from gi.repository import Gtk, Adw, GLib, Gio
 
+from downloader import format_size
+from installer import Install
+from settings import load_settings
+from update_checker import UpdateChecker
+from zsync import ZsyncUpdate
+
 
 class Home_page(Adw.Application):
     """
@@ -26,6 +33,9 @@ class Home_page(Adw.Application):
         self.portable_home_path = ""
         self.appimage_list = []
         self.appimage_rows = []
+        self.update_buttons = {}
+        self.update_checker = None
+        self.update_results = {}
 
         self.ui.select_appimage_button.connect("clicked", self.select_appimage)
         self.ui.set_portable_home_button.connect("clicked", self.set_portable_home)
@@ -167,9 +177,23 @@ class Home_page(Adw.Application):
             appimage_row,
         )
 
+        # update
+        update_button = Gtk.Button(
+            icon_name="software-update-available-symbolic",
+            tooltip_text="Update " + appimage_name,
+            valign=Gtk.Align.CENTER,
+            css_classes=["raised"],
+        )
+        update_button.connect(
+            "clicked", self.update_appimage, appimage_name, appimage_path
+        )
+
+        self.update_buttons[appimage_name] = update_button
+
         appimage_row.add_suffix(remove_button)
         appimage_row.add_suffix(open_appimage_folder_button)
         appimage_row.add_suffix(edit_button)
+        appimage_row.add_suffix(update_button)
         appimage_row.add_suffix(run_button)
 
         self.appimage_rows.append(appimage_row)
@@ -386,6 +410,236 @@ class Home_page(Adw.Application):
         appimage_data_folder = os.path.join(os.path.dirname(appimage_path))
         subprocess.Popen(["xdg-open", appimage_data_folder])
 
+    def update_appimage(self, button, appimage_name, appimage_path):
+        """
+        Updates the AppImage in a background thread, with zsync or by
+        installing the latest release over it. A release only matched to the
+        AppImage by name is installed once the user confirms it.
+
+        :param button: the button that triggered the update_appimage method
+        :param appimage_name: the name of the appimage
+        :param appimage_path: the path to the appimage file
+        """
+        result = self.update_results.get(appimage_name, {})
+        if result.get("possibly") and result["outdated"]:
+            self.confirm_update(button, appimage_name, appimage_path, result)
+            return
+        self.start_update(button, appimage_name, appimage_path)
+
+    def confirm_update(self, button, appimage_name, appimage_path, result):
+        """
+        Opens a dialog to confirm replacing the appimage with a release
+        that has the same name in the catalog.
+
+        :param button: the button that triggered the update
+        :param appimage_name: the name of the appimage
+        :param appimage_path: the path to the appimage file
+        :param result: the result of the last check of the appimage
+        """
+        dialog = Adw.MessageDialog(
+            heading="Replace " + appimage_name + "?",
+            transient_for=self.ui.win,
+            body=(
+                f"{appimage_name} has no version, it was only matched by its name to "
+                f"{os.path.basename(result['url'])} from the latest release of "
+                "the catalog. It may be a newer or a different build, "
+                "or another program."
+            ),
+            close_response="Cancel",
+            default_response="Cancel",
+        )
+        dialog.add_response("Cancel", "Cancel")
+        dialog.add_response("Replace", "Replace")
+
+        dialog.set_response_appearance("Replace", Adw.ResponseAppearance.DESTRUCTIVE)
+
+        dialog.connect(
+            "response",
+            self.handle_update_response,
+            button,
+            appimage_name,
+            appimage_path,
+        )
+        dialog.present()
+
+    def handle_update_response(
+        self, dialog, response_id, button, appimage_name, appimage_path
+    ):
+        """
+        Handles the user's response to the update dialog.
+
+        :param dialog: the dialog that triggered the handle_update_response method
+        :param response_id: the response id of the dialog
+        :param button: the button that triggered the update
+        :param appimage_name: the name of the appimage
+        :param appimage_path: the path to the appimage file
+        """
+        if response_id == "Replace":
+            self.start_update(button, appimage_name, appimage_path)
+
+    def start_update(self, button, appimage_name, appimage_path):
+        """
+        Starts the update of the AppImage in a background thread.
+
+        :param button: the button that triggered the update
+        :param appimage_name: the name of the appimage
+        :param appimage_path: the path to the appimage file
+        """
+        button.set_sensitive(False)
+        self.ui.show_toast("Updating " + appimage_name, 3000)
+        threading.Thread(
+            target=self.update_appimage_thread,
+            args=(button, appimage_name, appimage_path),
+            daemon=True,
+        ).start()
+
+    def update_appimage_thread(self, button, appimage_name, appimage_path):
+        """
+        Runs the update of the AppImage and reports the result on the main loop.
+        AppImages without update information are updated with the release
+        found by the last check.
+
+        :param button: the button that triggered the update
+        :param appimage_name: the name of the appimage
+        :param appimage_path: the path to the appimage file
+        """
+        result = self.update_results.get(appimage_name, {})
+        if result.get("source") == "release":
+            self.install_release(button, appimage_name, result)
+            return
+        try:
+            update = ZsyncUpdate(appimage_path)
+            if update.run():
+                GLib.idle_add(self.mark_outdated, {appimage_name: {"outdated": False}})
+                message = (
+                    f"{appimage_name} updated, downloaded "
+                    f"{format_size(update.downloaded)} and reused "
+                    f"{format_size(update.reused)}"
+                )
+            else:
+                message = appimage_name + " is up to date"
+        except Exception as e:
+            print(f"Error updating {appimage_name}: {e}")
+            message = f"Could not update {appimage_name}: {e}"
+        GLib.idle_add(self.finish_update, button, message)
+
+    def install_release(self, button, appimage_name, result):
+        """
+        Installs the latest release over the AppImage and reports the result
+        on the main loop.
+
+        :param button: the button that triggered the update
+        :param appimage_name: the name of the appimage
+        :param result: the result of the last check of the appimage
+        """
+        if not result["outdated"]:
+            GLib.idle_add(self.finish_update, button, appimage_name + " is up to date")
+            return
+        try:
+            install = Install(
+                result["url"],
+                self.portable_home_path,
+                appimage_name,
+                result["tag"],
+                replace=True,
+            )
+            source = install.run()
+            GLib.idle_add(
+                self.mark_outdated,
+                {appimage_name: {"outdated": False, "source": "release"}},
+            )
+            message = (
+                f"{appimage_name} updated, downloaded {format_size(source['size'])}"
+            )
+        except Exception as e:
+            print(f"Error updating {appimage_name}: {e}")
+            message = f"Could not update {appimage_name}: {e}"
+        GLib.idle_add(self.finish_update, button, message)
+
+    def finish_update(self, button, message):
+        """
+        Shows the result of an update.
+
+        :param button: the button that triggered the update
+        :param message: the message to show
+        :return: False, so the idle callback is not called again.
+        """
+        button.set_sensitive(True)
+        self.ui.show_toast(message, 5000)
+        return False
+
+    def check_updates(self, catalog=None):
+        """
+        Checks the installed AppImages for updates in a background thread,
+        then marks the outdated rows.
+
+        :param catalog: a dict mapping the names of the catalog to their download url,
+            used for the AppImages that were not installed from it
+        :return: False, so it can be used as an idle callback.
+        """
+        if self.update_checker is None:
+            settings = load_settings()
+            self.update_checker = UpdateChecker(
+                max_workers=settings["update_check_workers"],
+                ttl=settings["update_check_ttl"],
+            )
+        apps = {
+            appimage_name: os.path.join(
+                self.portable_home_path, appimage_name, appimage_name + ".AppImage"
+            )
+            for appimage_name in self.appimage_list
+        }
+        threading.Thread(
+            target=self.check_updates_thread, args=(apps, catalog), daemon=True
+        ).start()
+        return False
+
+    def check_updates_thread(self, apps, catalog):
+        """
+        Runs the update checks and hands the results to the main loop.
+
+        :param apps: A dict mapping app names to the paths of their AppImage.
+        :param catalog: A dict mapping the names of the catalog to their download url.
+        """
+        apps = {name: path for name, path in apps.items() if os.path.exists(path)}
+        results = self.update_checker.check_all(apps, catalog)
+        GLib.idle_add(self.mark_outdated, results)
+
+    def mark_outdated(self, results):
+        """
+        Marks the rows of the AppImages that have a newer version.
+
+        :param results: A dict mapping app names to the result of their check.
+        :return: False, so the idle callback is not called again.
+        """
+        self.update_results.update(results)
+        for row in self.appimage_rows:
+            appimage_name = row.get_title()
+            result = results.get(appimage_name)
+            if result is None:
+                continue
+            update_button = self.update_buttons.get(appimage_name)
+            if result["outdated"] and result.get("possibly"):
+                # Only matched by name, the update is not suggested
+                latest = result.get("latest")
+                row.set_subtitle(
+                    "Possibly outdated: " + latest if latest else "Possibly outdated"
+                )
+                if update_button is not None:
+                    update_button.remove_css_class("suggested-action")
+            elif result["outdated"]:
+                latest = result.get("latest")
+                row.set_subtitle(
+                    "Update available: " + latest if latest else "Update available"
+                )
+                if update_button is not None:
+                    update_button.add_css_class("suggested-action")
+            else:
+                row.set_subtitle("")
+                if update_button is not None:
+                    update_button.remove_css_class("suggested-action")
+        return False
+
     def run_appimage(self, button, appimage_path):
         """
         Runs the AppImage.
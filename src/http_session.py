@@ -0,0 +1,176 @@
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+from settings import load_settings
+
+# Connect and read timeouts, in seconds
+TIMEOUT = (10, 30)
+USER_AGENT = "AppsToGo"
+
+
+class Http2Response:
+    """
+    Wraps an httpx response so that it can be used like a requests response.
+    Errors while the body is read are raised as requests exceptions too.
+    """
+
+    def __init__(self, response, httpx) -> None:
+        """
+        Initializes the Http2Response object.
+
+        :param response: The httpx response.
+        :param httpx: The httpx module.
+        """
+        self.response = response
+        self.httpx = httpx
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self):
+        """
+        The body of the response, read on first access.
+
+        :raises requests.exceptions.RequestException: If the body could not be read.
+        """
+        try:
+            return self.response.read()
+        except self.httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    def json(self):
+        """
+        Parses the body of the response as JSON.
+
+        :raises requests.exceptions.RequestException: If the body could not be read.
+        """
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=None):
+        """
+        Iterates over the body of a streamed response.
+
+        :param chunk_size: The size of the chunks.
+        :raises requests.exceptions.RequestException: If the body could not be read.
+        """
+        try:
+            yield from self.response.iter_bytes(chunk_size)
+        except self.httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    def raise_for_status(self):
+        """
+        Raises an HTTPError for a 4xx or 5xx response.
+        """
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=self
+            )
+
+    def close(self):
+        """
+        Releases the connection of the response.
+        """
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Http2Session:
+    """
+    An optional HTTP/2 backend built on httpx, so that all the catalog requests
+    to a host are multiplexed over a single connection.
+    It mimics the small part of requests.Session used by AppsToGo.
+    """
+
+    def __init__(self, httpx, max_connections) -> None:
+        """
+        Initializes the Http2Session object.
+
+        :param httpx: The httpx module.
+        :param max_connections: The size of the connection pool.
+        """
+        self.httpx = httpx
+        self.client = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=max_connections),
+            timeout=httpx.Timeout(TIMEOUT[1], connect=TIMEOUT[0]),
+        )
+
+    def get(self, url, headers=None, timeout=None, stream=False, **kwargs):
+        """
+        Sends a GET request.
+
+        :param url: The url to fetch.
+        :param headers: Extra headers of the request.
+        :param timeout: The timeout of the request.
+        :param stream: If True, the body is read lazily.
+        :return: An Http2Response.
+        :raises requests.exceptions.RequestException: If the request failed.
+        """
+        if isinstance(timeout, tuple):
+            timeout = self.httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            request = self.client.build_request(
+                "GET", url, headers=headers, timeout=timeout or self.client.timeout
+            )
+            response = self.client.send(request, stream=stream)
+        except self.httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+        return Http2Response(response, self.httpx)
+
+
+def create_session(max_connections, http2=False):
+    """
+    Creates a connection pooled session with keep-alive and compressed transfers.
+
+    :param max_connections: The number of connections kept per host.
+    :param http2: Use the HTTP/2 backend if httpx and h2 are installed.
+    :return: A requests.Session, or an Http2Session.
+    """
+    if http2:
+        try:
+            import httpx
+            import h2  # noqa: F401
+
+            return Http2Session(httpx, max_connections)
+        except ImportError:
+            print("HTTP/2 needs httpx and h2, falling back to HTTP/1.1")
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(
+        {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"}
+    )
+    return session
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def shared_session():
+    """
+    Gets the HTTP session shared by the whole application, sized from the settings.
+
+    :return: The shared session.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            settings = load_settings()
+            _shared_session = create_session(
+                settings["fetch_max_workers"], settings["http2"]
+            )
+        return _shared_session
@@ -0,0 +1,411 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future
+import requests
+
+from feed_cache import CACHE_DIR
+
+IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "images")
+NEGATIVE_SAVE_DELAY = 5  # seconds, new failures are saved together
+# Client errors that will not go away by trying again soon
+TRANSIENT_STATUS = {408, 429}
+CANCELLED = object()  # result of a shared fetch whose leader was cancelled
+EVICT_TARGET = 0.8  # share of the cap eviction goes down to, so that it runs rarely
+
+
+class ImageCache:
+    """
+    A disk cache for the catalog icons and screenshots, keyed by the hash of their url.
+    Each entry keeps the validators (ETag / Last-Modified) of its response so it can be
+    revalidated, and the least recently used entries are evicted above a size cap.
+    Concurrent fetches of one url share a single request, and urls that failed
+    for good (such as a missing screenshot) are not asked for again until a TTL.
+    Images imported from a catalog bundle are pinned: they are kept apart,
+    never evicted and never revalidated.
+    """
+
+    def __init__(
+        self,
+        cache_dir=IMAGE_CACHE_DIR,
+        max_bytes=200 * 1024 * 1024,
+        max_age=86400,
+        negative_ttl=3 * 86400,
+    ) -> None:
+        """
+        Initializes the ImageCache object.
+
+        :param cache_dir: The directory where the images are cached.
+        :param max_bytes: The size cap of the cache, in bytes.
+        :param max_age: How long an entry is used without revalidation, in seconds.
+        :param negative_ttl: How long a failed url is not fetched again, in seconds.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+        self.negative_file = os.path.join(cache_dir, "negative.json")
+        self.pinned_dir = os.path.join(cache_dir, "pinned")
+        self.negative = None
+        self.negative_timer = None
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        # Guards the size and eviction, which walk the disk, apart from the
+        # lock of the in-flight table so that fetches never wait for a walk
+        self.size_lock = threading.Lock()
+        self.total_bytes = None
+
+    def paths(self, url):
+        """
+        Gets the paths of the body and the metadata of a cache entry.
+
+        :param url: The url of the image.
+        :return: A tuple with the body path and the metadata path.
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()
+        path = os.path.join(self.cache_dir, key[:2], key)
+        return path, path + ".json"
+
+    def pinned_path(self, url):
+        """
+        Gets the path of a pinned image.
+
+        :param url: The url of the image.
+        :return: The path of the body.
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.pinned_dir, key[:2], key)
+
+    def pin(self, url, content):
+        """
+        Stores an image outside of the size cap, such as one imported from a bundle.
+
+        :param url: The url of the image.
+        :param content: The bytes of the image.
+        :raises OSError: If the image could not be written.
+        """
+        path = self.pinned_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.write_atomic(path, content)
+
+    def peek(self, url):
+        """
+        Gets an image from the disk only, without any request, even if it is stale.
+
+        :param url: The url of the image.
+        :return: The bytes of the image, or None if it is not on the disk.
+        """
+        content = self.read(self.pinned_path(url))
+        if content is None:
+            content = self.read(self.paths(url)[0])
+        return content
+
+    def fetch(self, url, fetch_pool, token=None):
+        """
+        Gets an image from the cache, downloading or revalidating it when needed.
+
+        :param url: The url of the image.
+        :param fetch_pool: The FetchPool used for the requests.
+        :param token: A CancelToken, no request is made once it is cancelled.
+        :return: The bytes of the image, or None if it could not be fetched.
+        :raises requests.exceptions.RequestException: If the request failed
+            and there is no cached copy to fall back to.
+        """
+        pinned = self.read(self.pinned_path(url))
+        if pinned is not None:
+            return pinned
+        path, meta_path = self.paths(url)
+        content = self.read(path)
+        meta = self.read_meta(meta_path) if content is not None else {}
+
+        if content is not None and time.time() - meta.get("checked", 0) < self.max_age:
+            self.touch(path)
+            return content
+        if content is None and self.is_missing(url):
+            return None
+
+        while True:
+            with self.lock:
+                future = self.in_flight.get(url)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self.in_flight[url] = future
+            if not leader:
+                # Another caller is fetching the url, its result is shared
+                result = future.result()
+                if result is CANCELLED:
+                    if token is not None and token.is_cancelled():
+                        return None
+                    continue
+                return result
+
+            try:
+                result = self.download(url, fetch_pool, token, content, meta)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+            finally:
+                with self.lock:
+                    del self.in_flight[url]
+            return None if result is CANCELLED else result
+
+    def download(self, url, fetch_pool, token, content, meta):
+        """
+        Downloads or revalidates an image, for all the callers fetching its url.
+
+        :param url: The url of the image.
+        :param fetch_pool: The FetchPool used for the requests.
+        :param token: The CancelToken of the caller that makes the request.
+        :param content: The bytes of the cached copy, or None.
+        :param meta: The metadata of the cached copy.
+        :return: The bytes of the image, None if it could not be fetched,
+            or CANCELLED if the token was cancelled.
+        :raises requests.exceptions.RequestException: If the request failed
+            and there is no cached copy to fall back to.
+        """
+        path, meta_path = self.paths(url)
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = fetch_pool.get(url, token, headers=headers)
+        except requests.exceptions.RequestException:
+            if content is None:
+                raise
+            return content
+
+        if response is None:
+            return CANCELLED
+
+        if response.status_code == 304 and content is not None:
+            meta["checked"] = time.time()
+            self.write_meta(meta_path, meta)
+            self.touch(path)
+            return content
+        if response.status_code != 200:
+            if (
+                400 <= response.status_code < 500
+                and response.status_code not in TRANSIENT_STATUS
+            ):
+                self.mark_missing(url)
+            return None
+
+        self.store(url, response.content, response.headers)
+        return response.content
+
+    def is_missing(self, url):
+        """
+        Checks if an url failed for good recently.
+
+        :param url: The url of the image.
+        :return: True if the url is in the negative cache and did not expire.
+        """
+        with self.lock:
+            if self.negative is None:
+                self.negative = self.load_negative()
+            expires = self.negative.get(url)
+        return expires is not None and expires > time.time()
+
+    def mark_missing(self, url):
+        """
+        Adds an url to the negative cache, which is saved shortly after.
+
+        :param url: The url of the image.
+        """
+        with self.lock:
+            if self.negative is None:
+                self.negative = self.load_negative()
+            self.negative[url] = time.time() + self.negative_ttl
+            if self.negative_timer is None:
+                self.negative_timer = threading.Timer(
+                    NEGATIVE_SAVE_DELAY, self.save_negative
+                )
+                self.negative_timer.daemon = True
+                self.negative_timer.start()
+
+    def load_negative(self):
+        """
+        Loads the negative cache, without its expired entries.
+
+        :return: A dict mapping each failed url to the time it expires.
+        """
+        try:
+            with open(self.negative_file, "r") as f:
+                negative = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {url: expires for url, expires in negative.items() if expires > now}
+
+    def save_negative(self):
+        """
+        Saves the negative cache.
+        """
+        with self.lock:
+            self.negative_timer = None
+            now = time.time()
+            negative = {
+                url: expires for url, expires in self.negative.items() if expires > now
+            }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.write_atomic(self.negative_file, json.dumps(negative).encode())
+        except OSError as e:
+            print(f"Error saving image cache: {e}")
+
+    def store(self, url, content, headers):
+        """
+        Stores an image and its validators, then evicts old entries if over the cap.
+
+        :param url: The url of the image.
+        :param content: The bytes of the image.
+        :param headers: The headers of the response.
+        """
+        path, meta_path = self.paths(url)
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "checked": time.time(),
+        }
+        try:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.write_atomic(path, content)
+            self.write_meta(meta_path, meta)
+        except OSError as e:
+            print(f"Error saving image cache: {e}")
+            return
+
+        with self.size_lock:
+            if self.total_bytes is None:
+                self.total_bytes = self.scan_size()
+            else:
+                self.total_bytes += len(content) - old_size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def read(self, path):
+        """
+        Reads the body of a cache entry.
+
+        :param path: The path of the body.
+        :return: The bytes, or None if the entry does not exist.
+        """
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def read_meta(self, meta_path):
+        """
+        Reads the metadata of a cache entry.
+
+        :param meta_path: The path of the metadata.
+        :return: A dict with the metadata, empty if there is none.
+        """
+        try:
+            with open(meta_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_meta(self, meta_path, meta):
+        """
+        Writes the metadata of a cache entry.
+
+        :param meta_path: The path of the metadata.
+        :param meta: The metadata.
+        """
+        try:
+            self.write_atomic(meta_path, json.dumps(meta).encode())
+        except OSError as e:
+            print(f"Error saving image cache: {e}")
+
+    def write_atomic(self, path, content):
+        """
+        Writes a file through a unique temporary file, so that several workers
+        can write the same entry at once and readers never see a partial copy.
+
+        :param path: The path of the file.
+        :param content: The bytes to write.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def touch(self, path):
+        """
+        Marks a cache entry as recently used.
+
+        :param path: The path of the body.
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def entries(self):
+        """
+        Lists the bodies of all the cache entries.
+
+        :return: A list of (path, size, last used time) tuples.
+        """
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            if root == self.cache_dir and "pinned" in dirs:
+                dirs.remove("pinned")
+            for file in files:
+                if file.endswith(".json") or file.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def scan_size(self):
+        """
+        Computes the size of the cache from the disk.
+
+        :return: The size of all the bodies, in bytes.
+        """
+        return sum(size for path, size, used in self.entries())
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is well under
+        its cap, so that the next stores do not walk the cache again straight away.
+        Must be called with the size lock held.
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for path, size, used in entries)
+        target = self.max_bytes * EVICT_TARGET
+        for path, size, used in entries:
+            if total <= target:
+                break
+            for entry_path in (path, path + ".json"):
+                try:
+                    os.remove(entry_path)
+                except OSError:
+                    pass
+            total -= size
+        self.total_bytes = total
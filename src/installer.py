@@ -0,0 +1,128 @@
+import os
+import json
+import time
+
+from downloader import Download
+
+ELF_MAGIC = b"\x7fELF"
+# Written at offset 8 of the ELF header, for type 1 and type 2 AppImages
+APPIMAGE_MAGICS = (b"AI\x01", b"AI\x02")
+
+
+def app_name(name):
+    """
+    Turns a catalog name into a name usable as a folder of the portable home.
+
+    :param name: The name of the catalog entry.
+    :return: The folder name.
+    """
+    return name.replace("/", "-").strip(". ") or "AppImage"
+
+
+class Install(Download):
+    """
+    Installs an AppImage into the portable home in a single pass.
+    The download is streamed straight into <name>/<name>.AppImage.part, then made
+    executable and renamed into place, so each byte is written once and only
+    its header is read back, to check that it is an AppImage. The SHA-1 hashed
+    while downloading is recorded in source.json.
+    With replace set, an installed AppImage is updated to the new download the
+    same way, keeping its home folder.
+    """
+
+    def __init__(
+        self,
+        url,
+        portable_home_path,
+        name,
+        tag=None,
+        session=None,
+        segments=4,
+        on_progress=None,
+        token=None,
+        replace=False,
+    ) -> None:
+        """
+        Initializes the Install object.
+
+        :param url: The url of the AppImage.
+        :param portable_home_path: The path to the portable home directory.
+        :param name: The name of the app in the portable home.
+        :param tag: The release tag of the AppImage, if known.
+        :param session: The HTTP session, the shared one by default.
+        :param segments: The number of connections used at once.
+        :param on_progress: Called with the progress, see Download.
+        :param token: A CancelToken, the install stops once it is cancelled.
+        :param replace: True to replace the AppImage if it is already installed.
+        """
+        self.name = name
+        self.tag = tag
+        self.replace = replace
+        self.directory = os.path.join(portable_home_path, name)
+        self.destination = os.path.join(self.directory, name + ".AppImage")
+        super().__init__(
+            url,
+            self.destination + ".part",
+            session=session,
+            segments=segments,
+            on_progress=on_progress,
+            token=token,
+        )
+
+    def run(self):
+        """
+        Downloads and installs the AppImage, resuming an interrupted install.
+
+        :return: The source metadata of the installed AppImage,
+            or None if the install was cancelled.
+        :raises FileExistsError: If the app is already installed, without replace.
+        :raises requests.exceptions.RequestException: If the download failed.
+        :raises ValueError: If the download is not an AppImage.
+        :raises OSError: If the AppImage could not be written.
+        """
+        if os.path.exists(self.destination) and not self.replace:
+            raise FileExistsError(f"{self.name} is already installed")
+        os.makedirs(self.directory, exist_ok=True)
+        if not super().run():
+            return None
+        self.check_appimage()
+
+        # The file only appears under its final name once it is complete and executable
+        os.chmod(self.path, 0o755)
+        stat = os.stat(self.path)
+        os.replace(self.path, self.destination)
+        source = {
+            "url": self.url,
+            "tag": self.tag,
+            "size": stat.st_size,
+            # The SHA-1 describes the file as long as its size and mtime are unchanged
+            "mtime": stat.st_mtime,
+            "sha1": self.sha1,
+            "segments": self.segment_sha1s,
+            "installed": int(time.time()),
+        }
+        os.makedirs(
+            os.path.join(self.directory, self.name + ".AppImage.home"), exist_ok=True
+        )
+        with open(os.path.join(self.directory, "source.json"), "w") as f:
+            json.dump(source, f)
+        return source
+
+    def check_appimage(self):
+        """
+        Checks that the download is an AppImage before it is made executable,
+        and removes it otherwise, such as when the server sent an HTML page.
+
+        :raises ValueError: If the download is not an AppImage.
+        """
+        with open(self.path, "rb") as f:
+            header = f.read(11)
+        if header[:4] != ELF_MAGIC or header[8:11] not in APPIMAGE_MAGICS:
+            os.remove(self.path)
+            self.remove_state()
+            try:
+                # Only removed if the install left nothing else in it
+                os.rmdir(self.directory)
+            except OSError:
+                pass
+            raise ValueError(f"{self.url} did not send an AppImage")
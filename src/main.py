@@ -4,7 +4,7 @@ import sys
 
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
-from gi.repository import Adw, Gio
+from gi.repository import Adw, Gio, GLib
 
 # Import classes from other files
 from download_page import Download_Page
@@ -24,7 +24,7 @@ class MyApp(Adw.Application):
         self.ui = Ui()  # Instantiate Ui only once
 
         self.hp = Home_page(self.ui)
-        self.dp = Download_Page(self.ui)
+        self.dp = None  # Built after the window is presented
         self.portable_home_path = ""
         self.appimage_list = []
         self.appimage_rows = []
@@ -43,6 +43,25 @@ class MyApp(Adw.Application):
         self.ui.win.set_application(app)
         self.ui.win.present()
 
+        self.ui.stack.connect("notify::visible-child-name", self.on_page_changed)
+        # The download page checks the home page for updates once its catalog is loaded
+        GLib.idle_add(self.build_download_page)
+
+    def on_page_changed(self, stack, param):
+        """
+        Builds the download page as soon as the user switches to it.
+        """
+        if stack.get_visible_child_name() == "download":
+            self.build_download_page()
+
+    def build_download_page(self):
+        """
+        Builds the download page, if it was not built yet.
+        """
+        if self.dp is None:
+            self.dp = Download_Page(self.ui, self.hp)
+        return False
+
     def header_menu(self):
         """
         Creates the header menu.
@@ -87,5 +106,9 @@ class MyApp(Adw.Application):
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bundle":
+        import bundle
+
+        sys.exit(bundle.main(sys.argv[2:]))
     app = MyApp()
     app.run(sys.argv)
@@ -0,0 +1,199 @@
+import re
+import threading
+
+from catalog import diff_entries
+
+TOKEN_RE = re.compile(r"\w+")
+EMPTY = frozenset()
+
+
+def tokenize(text):
+    """
+    Splits a text into normalized tokens.
+
+    :param text: The text to split.
+    :return: A list with the lowercase words of the text.
+    """
+    return TOKEN_RE.findall((text or "").casefold())
+
+
+class SearchIndex:
+    """
+    An inverted index of the catalog, mapping every prefix of the name and description
+    tokens to the names of the items containing them. A query is answered with a
+    lookup per query token and a set intersection, name matches ranked first.
+    Categories are indexed the same way, so they can be combined with a query.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes the SearchIndex object.
+        """
+        self.name_postings = {}
+        self.description_postings = {}
+        self.category_postings = {}
+        self.documents = {}
+        self.entries = {}
+        self.order = {}
+        self.lock = threading.Lock()
+
+    def sync(self, items):
+        """
+        Brings the index in line with a new copy of the feed, only re-indexing
+        the items that were added, removed or changed.
+
+        :param items: The CatalogEntry records of the feed.
+        :return: A CatalogDiff with the changes.
+        """
+        entries = {item.name: item for item in items}
+
+        with self.lock:
+            diff = diff_entries(self.entries, entries.values())
+            for name in diff.removed | diff.changed:
+                self.remove(name)
+            for name in diff.added | diff.changed:
+                item = entries[name]
+                self.add(name, item.name, item.description, item.categories)
+            self.entries = entries
+            self.order = {name: position for position, name in enumerate(entries)}
+        return diff
+
+    def add(self, key, name, description, categories):
+        """
+        Adds an item to the index. Must be called with the lock held.
+
+        :param key: The key of the item.
+        :param name: The name of the item.
+        :param description: The description of the item.
+        :param categories: The categories of the item.
+        """
+        self.documents[key] = (name, description, categories)
+        for prefix in self.prefixes(name):
+            self.name_postings.setdefault(prefix, set()).add(key)
+        for prefix in self.prefixes(description):
+            self.description_postings.setdefault(prefix, set()).add(key)
+        for category in categories:
+            self.category_postings.setdefault(category, set()).add(key)
+
+    def remove(self, key):
+        """
+        Removes an item from the index. Must be called with the lock held.
+
+        :param key: The key of the item.
+        """
+        name, description, categories = self.documents.pop(key)
+        for postings, terms in (
+            (self.name_postings, self.prefixes(name)),
+            (self.description_postings, self.prefixes(description)),
+            (self.category_postings, categories),
+        ):
+            for prefix in terms:
+                keys = postings.get(prefix)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del postings[prefix]
+
+    def prefixes(self, text):
+        """
+        Gets every prefix of every token of a text.
+
+        :param text: The text.
+        :return: A set with the prefixes.
+        """
+        prefixes = set()
+        for token in tokenize(text):
+            for end in range(1, len(token) + 1):
+                prefixes.add(token[:end])
+        return prefixes
+
+    def count(self, category=None):
+        """
+        Counts the items of a category.
+
+        :param category: The category, or None for every item.
+        :return: The number of items.
+        """
+        with self.lock:
+            if category is None:
+                return len(self.order)
+            return len(self.category_postings.get(category, EMPTY))
+
+    def category_counts(self):
+        """
+        Counts the items of every category.
+
+        :return: A dict mapping each category to its number of items.
+        """
+        with self.lock:
+            return {
+                category: len(keys) for category, keys in self.category_postings.items()
+            }
+
+    def filter(self, category=None):
+        """
+        Lists the items of a category.
+
+        :param category: The category, or None for every item.
+        :return: The keys of the items, in feed order.
+        """
+        with self.lock:
+            if category is None:
+                return list(self.order)
+            keys = self.category_postings.get(category, EMPTY)
+            order = self.order
+            return sorted(keys, key=lambda key: order.get(key, 0))
+
+    def download_urls(self):
+        """
+        Lists the download urls of the items.
+
+        :return: A dict mapping the name of each item to its download url.
+        """
+        with self.lock:
+            return {name: entry.download_url for name, entry in self.entries.items()}
+
+    def search(self, query, within=None, category=None):
+        """
+        Finds the items matching every token of a query.
+
+        :param query: The search query.
+        :param within: Keys to narrow down, such as the results of a shorter
+            query, or None to search the whole index.
+        :param category: Only match the items of this category, if not None.
+        :return: The keys of the matching items, name matches first,
+            then in feed order.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self.lock:
+            results = set(within) if within is not None else None
+            if category is not None:
+                keys = self.category_postings.get(category, EMPTY)
+                results = set(keys) if results is None else results & keys
+            for token in tokens:
+                name_keys = self.name_postings.get(token, EMPTY)
+                description_keys = self.description_postings.get(token, EMPTY)
+                if results is None:
+                    results = name_keys | description_keys
+                else:
+                    # Only walk the candidates, which is cheap when narrowing
+                    results = {
+                        key
+                        for key in results
+                        if key in name_keys or key in description_keys
+                    }
+                if not results:
+                    return []
+
+            name_postings = [self.name_postings.get(token, EMPTY) for token in tokens]
+            order = self.order
+            return sorted(
+                results,
+                key=lambda key: (
+                    -sum(key in name_keys for name_keys in name_postings),
+                    order.get(key, 0),
+                ),
+            )
@@ -0,0 +1,42 @@
+import os
+import json
+
+SETTINGS_FILE = os.path.expanduser("~/.config/AppsToGo/settings.json")
+
+# Values used when settings.json does not set them
+DEFAULTS = {
+    "fetch_max_workers": 8,
+    "fetch_per_host": 4,
+    "fetch_retries": 3,
+    "fetch_backoff": 0.5,
+    "http2": False,
+    "image_cache_max_bytes": 200 * 1024 * 1024,
+    "image_cache_max_age": 86400,
+    "image_negative_ttl": 3 * 86400,
+    "texture_cache_max_bytes": 64 * 1024 * 1024,
+    "catalog_backend": "memory",  # or "sqlite" for the FTS5 catalog database
+    "catalog_bundle": None,  # path of an offline catalog bundle to browse
+    "feed_refresh_interval": 3600,  # seconds, 0 to only refresh at startup
+    "download_segments": 4,  # connections per AppImage download
+    "update_check_workers": 8,  # installed AppImages checked at once
+    "update_check_ttl": 6 * 3600,  # seconds an update check is reused
+}
+
+
+def load_settings():
+    """
+    Loads the settings from settings.json, falling back to the defaults.
+
+    :return: A dict with all the settings.
+    """
+    settings = dict(DEFAULTS)
+    try:
+        with open(SETTINGS_FILE, "r") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            settings.update(data)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Error loading settings: {e}")
+    return settings
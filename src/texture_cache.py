@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+
+class TextureCache:
+    """
+    A process wide cache of decoded textures, keyed by url and display size.
+    It is bounded by the total bytes of the pixels it holds, and evicts the
+    least recently used textures when over budget.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024) -> None:
+        """
+        Initializes the TextureCache object.
+
+        :param max_bytes: The budget of the cache, in pixel bytes.
+        """
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.textures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url, size):
+        """
+        Gets a texture from the cache, marking it as recently used.
+
+        :param url: The url of the image.
+        :param size: The size the image is shown at.
+        :return: The texture, or None if it is not cached.
+        """
+        key = (url, size)
+        with self.lock:
+            entry = self.textures.get(key)
+            if entry is None:
+                return None
+            self.textures.move_to_end(key)
+            return entry[0]
+
+    def put(self, url, size, texture):
+        """
+        Adds a texture to the cache, evicting old ones if over budget.
+
+        :param url: The url of the image.
+        :param size: The size the image is shown at.
+        :param texture: The Gdk.Texture.
+        """
+        key = (url, size)
+        nbytes = texture.get_width() * texture.get_height() * 4
+        if nbytes > self.max_bytes:
+            return
+        with self.lock:
+            old = self.textures.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.textures[key] = (texture, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                key, (texture, nbytes) = self.textures.popitem(last=False)
+                self.total_bytes -= nbytes
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_texture_cache(max_bytes=64 * 1024 * 1024):
+    """
+    Gets the texture cache shared by the whole application.
+
+    :param max_bytes: The budget of the cache, used when it is first created.
+    :return: The shared TextureCache.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = TextureCache(max_bytes)
+        return _shared_cache
@@ -87,15 +87,26 @@ class Ui(Adw.Application):
         # Create the combo box for selecting categories in the download section
         self.category_combo = Gtk.ComboBoxText()
 
-        # Create the preferences group for the download section
+        # Create the preferences group holding the header of the download section
         self.download_app_group = Adw.PreferencesGroup(
             title="Download",
             header_suffix=self.download_header_box,
             margin_top=10,
-            vexpand=True,
-            vexpand_set=True,
         )
 
+        # Create the list view for the catalog, only the visible rows are built
+        self.download_list_view = Gtk.ListView(
+            show_separators=True,
+        )
+
+        # Create the spinner shown while the catalog is loading
+        self.download_spinner = Gtk.Spinner(
+            spinning=True,
+            height_request=32,
+            margin_top=20,
+        )
+        self.download_app_group.add(self.download_spinner)
+
         # Create the scrolled window for the home page
         self.home_page_window = Gtk.ScrolledWindow(
             child=Adw.Clamp(
@@ -106,11 +117,18 @@ class Ui(Adw.Application):
 
         # Create the scrolled window for the download section
         self.download_window = Gtk.ScrolledWindow(
-            child=Adw.Clamp(
-                child=self.download_app_group,
-                vexpand=True,
+            child=Adw.ClampScrollable(
+                child=self.download_list_view,
             ),
+            vexpand=True,
+        )
+
+        # Create the download page box, with the header above the catalog
+        self.download_page_box = Gtk.Box(
+            orientation=Gtk.Orientation.VERTICAL,
         )
+        self.download_page_box.append(Adw.Clamp(child=self.download_app_group))
+        self.download_page_box.append(self.download_window)
 
         # Create the view stack for the UI
         self.stack = Adw.ViewStack.new()
@@ -125,7 +143,7 @@ class Ui(Adw.Application):
             self.home_page_window, "home", "Home", "user-home-symbolic"
         )
         self.stack.add_titled_with_icon(
-            self.download_window, "download", "Download", "document-save-symbolic"
+            self.download_page_box, "download", "Download", "document-save-symbolic"
         )
 
         # Set the title widget for the header bar to the view switcher
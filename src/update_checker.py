@@ -0,0 +1,424 @@
+import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from downloader import ARCH_ALIASES, GITHUB_API_URL, pick_appimage
+from feed_cache import CACHE_DIR
+from http_session import TIMEOUT, shared_session
+from zsync import file_sha1, find_asset, parse_headers, read_update_info
+
+UPDATES_FILE = os.path.join(CACHE_DIR, "updates.json")
+MAX_HEADER_SIZE = 64 * 1024  # the text headers of a .zsync file are much smaller
+# A version number, such as "v1.2.3" in a release tag or "1.2.3" in a file name
+VERSION = re.compile(r"(?<![a-z0-9])v?(\d+(?:\.\d+)*)(?![a-z0-9])", re.IGNORECASE)
+# The dotted version that AppImage file names usually end with
+VERSION_SUFFIX = re.compile(r"[-_ ]+v?\d+(?:\.\d+)+(?![a-z0-9]).*$")
+# An architecture in a file name, whose digits are not a version
+ARCH = re.compile(
+    r"[-_ .]+({})(?![a-z0-9])".format(
+        "|".join(alias for aliases in ARCH_ALIASES.values() for alias in aliases)
+    )
+)
+
+
+def catalog_key(name):
+    """
+    Reduces the name of an app to what is compared with the names of the catalog,
+    so that an AppImage added as "Inkscape-1.2.2_x86_64" matches "Inkscape".
+
+    :param name: The name of the app or of the catalog entry.
+    :return: The key.
+    """
+    name = ARCH.sub("", name.lower())
+    return re.sub(r"[^a-z0-9]", "", VERSION_SUFFIX.sub("", name))
+
+
+def parse_version(text):
+    """
+    Finds the first version number of a release tag or a file name.
+
+    :param text: The tag or the name.
+    :return: The version as a tuple of numbers without trailing zeros,
+        so that "1.2" and "1.2.0" are equal, or None if there is none.
+    """
+    match = VERSION.search(ARCH.sub("", (text or "").lower()))
+    if match is None:
+        return None
+    version = [int(part) for part in match.group(1).split(".")]
+    while len(version) > 1 and version[-1] == 0:
+        version.pop()
+    return tuple(version)
+
+
+def github_repo(url):
+    """
+    Gets the GitHub repository of a url.
+
+    :param url: The url, such as a repository, release or asset url.
+    :return: The owner and the name of the repository, or None if the url
+        is not on GitHub.
+    """
+    parts = urlsplit(url or "")
+    path = parts.path.strip("/").split("/")
+    if parts.netloc != "github.com" or len(path) < 2:
+        return None
+    return path[0], path[1]
+
+
+class UpdateChecker:
+    """
+    Finds which installed AppImages have a newer version, checking them
+    concurrently with bounded parallelism. AppImages with embedded update
+    information are compared with the SHA-1 of their .zsync control file,
+    the others with the latest GitHub release of the source they were
+    installed from, or else of the catalog entry with the same name.
+    Responses are cached in updates.json: within the TTL nothing is
+    requested, after it a conditional request usually gets a 304.
+    The SHA-1 of each local file is cached by size and modification time,
+    and taken from its source.json when Install hashed it while downloading.
+    """
+
+    def __init__(
+        self, session=None, max_workers=8, ttl=6 * 3600, path=UPDATES_FILE
+    ) -> None:
+        """
+        Initializes the UpdateChecker object.
+
+        :param session: The HTTP session, the shared one by default.
+        :param max_workers: The number of AppImages checked at once.
+        :param ttl: The number of seconds a response is used without a request.
+        :param path: The path of the cache file.
+        """
+        self.session = session or shared_session()
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.path = path
+        self.lock = threading.Lock()
+        self.responses = {}  # url -> validators, value and time of the last check
+        self.hashes = {}  # path -> size, mtime and SHA-1 of a local file
+        self.load()
+
+    def load(self):
+        """
+        Loads the cache file.
+        """
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.responses = data.get("responses", {})
+            self.hashes = data.get("hashes", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def save(self):
+        """
+        Saves the cache file.
+        """
+        with self.lock:
+            content = json.dumps({"responses": self.responses, "hashes": self.hashes})
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving update cache: {e}")
+
+    def check_all(self, apps, catalog=None):
+        """
+        Checks every AppImage for a newer version.
+
+        :param apps: A dict mapping app names to the paths of their AppImage.
+        :param catalog: A dict mapping the names of the catalog to their download url.
+        :return: A dict mapping app names to their result, see check.
+            Apps that could not be checked are left out.
+        """
+        download_urls = {
+            catalog_key(name): url for name, url in (catalog or {}).items()
+        }
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                name: executor.submit(
+                    self.check, path, download_urls.get(catalog_key(name))
+                )
+                for name, path in apps.items()
+            }
+            for name, future in futures.items():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error checking {name} for updates: {e}")
+                    continue
+                if result is not None:
+                    results[name] = result
+        self.save()
+        return results
+
+    def check(self, path, download_url=None):
+        """
+        Checks an AppImage for a newer version.
+
+        :param path: The path of the AppImage.
+        :param download_url: The download url of its catalog entry, if any.
+        :return: A dict with "outdated", "latest" (the latest version, if known)
+            and "source": "zsync" when the AppImage updates itself with zsync,
+            otherwise "release", with the "url" and "tag" of the AppImage of the
+            latest release, and "possibly" when the release was only matched by
+            name, see check_catalog. None if the AppImage has no known source.
+        :raises requests.exceptions.RequestException: If a request failed.
+        :raises ValueError: If a response was invalid.
+        :raises OSError: If the AppImage could not be read.
+        """
+        update_info = read_update_info(path)
+        if update_info is not None:
+            return self.check_zsync(path, update_info)
+        result = self.check_source(path)
+        if result is None and download_url is not None:
+            result = self.check_catalog(path, download_url)
+        return result
+
+    def check_zsync(self, path, update_info):
+        """
+        Compares an AppImage with the .zsync control file of its update information.
+
+        :param path: The path of the AppImage.
+        :param update_info: The update information embedded in the AppImage.
+        :return: The result, or None if the update information is not supported.
+        """
+        fields = update_info.split("|")
+        latest = None
+        if fields[0] == "zsync" and len(fields) == 2:
+            zsync_url = fields[1]
+        elif fields[0] == "gh-releases-zsync" and len(fields) == 5:
+            owner, repo, tag, pattern = fields[1:]
+            release = self.release(owner, repo, tag)
+            latest = release["tag"]
+            zsync_url = find_asset(release["assets"], pattern)
+            if zsync_url is None:
+                return None
+        else:
+            return None
+
+        control = self.cached(zsync_url, self.parse_control_headers)
+        return {
+            "outdated": self.local_sha1(path) != control["sha1"],
+            "latest": latest,
+            "source": "zsync",
+        }
+
+    def check_source(self, path):
+        """
+        Compares the release tag an AppImage was installed from with the latest
+        release, using the source.json written by Install.
+
+        :param path: The path of the AppImage.
+        :return: The result, or None if the source is unknown or not a GitHub release.
+        """
+        try:
+            with open(os.path.join(os.path.dirname(path), "source.json"), "r") as f:
+                source = json.load(f)
+        except (OSError, ValueError):
+            return None
+        tag = source.get("tag")
+        repo = github_repo(source.get("url"))
+        if tag is None or repo is None:
+            return None
+
+        release = self.release(*repo, "latest")
+        return self.release_result(release, release["tag"] not in (None, tag))
+
+    def check_catalog(self, path, download_url):
+        """
+        Compares an AppImage added without a source, such as from a scanned
+        folder, with the latest release of its catalog entry, by the version in
+        its file name and the tag of the release. When either has no version,
+        the entry only matched by name: the AppImage is then only "possibly"
+        outdated, when its size differs from the AppImage of that release, and
+        updating it needs a confirmation.
+
+        :param path: The path of the AppImage.
+        :param download_url: The download url of its catalog entry.
+        :return: The result, or None if the entry is not on GitHub.
+        """
+        repo = github_repo(download_url)
+        if repo is None:
+            return None
+        release = self.release(*repo, "latest")
+        installed = parse_version(os.path.basename(path))
+        latest = parse_version(release["tag"])
+        if installed is not None and latest is not None:
+            # A newer build, such as a prerelease, is never downgraded
+            return self.release_result(release, installed < latest)
+
+        asset = pick_appimage(release["assets"])
+        size = asset and asset.get("size")
+        result = self.release_result(
+            release, size is not None and size != os.path.getsize(path)
+        )
+        result["possibly"] = True
+        return result
+
+    def release_result(self, release, newer):
+        """
+        Builds the result of an AppImage updated by installing a release.
+
+        :param release: The latest release, see parse_release.
+        :param newer: True if the release is newer than the AppImage.
+        :return: The result, with the AppImage of the release to install.
+        """
+        asset = pick_appimage(release["assets"])
+        return {
+            "outdated": newer and asset is not None,
+            "latest": release["tag"],
+            "source": "release",
+            "url": asset and asset["browser_download_url"],
+            "tag": release["tag"],
+        }
+
+    def release(self, owner, repo, tag):
+        """
+        Gets a release of a GitHub repository.
+
+        :param owner: The owner of the repository.
+        :param repo: The name of the repository.
+        :param tag: The tag of the release, or "latest".
+        :return: A dict with the "tag" and the "assets" of the release.
+        """
+        release = "latest" if tag == "latest" else "tags/" + tag
+        return self.cached(
+            GITHUB_API_URL.format(owner=owner, repo=repo, release=release),
+            self.parse_release,
+            {"Accept": "application/vnd.github+json"},
+        )
+
+    def cached(self, url, parse, headers=None):
+        """
+        Gets a value parsed from a url, from the cache while it is fresh,
+        otherwise with a conditional request.
+
+        :param url: The url.
+        :param parse: Turns the response into a JSON serializable value.
+        :param headers: More headers for the request.
+        :return: The parsed value.
+        :raises requests.exceptions.RequestException: If the request failed.
+        """
+        with self.lock:
+            entry = self.responses.get(url)
+        now = time.time()
+        if entry is not None and now - entry["checked"] < self.ttl:
+            return entry["value"]
+
+        headers = dict(headers or {})
+        if entry is not None:
+            # GitHub does not count 304 responses against the rate limit
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = self.session.get(url, headers=headers, timeout=TIMEOUT, stream=True)
+        with response:
+            if response.status_code == 304 and entry is not None:
+                value = entry["value"]
+            else:
+                response.raise_for_status()
+                value = parse(response)
+            previous = entry or {}
+            entry = {
+                "etag": response.headers.get("ETag") or previous.get("etag"),
+                "last_modified": response.headers.get("Last-Modified")
+                or previous.get("last_modified"),
+                "value": value,
+                "checked": now,
+            }
+        with self.lock:
+            self.responses[url] = entry
+        return value
+
+    def parse_release(self, response):
+        """
+        Keeps what the checker needs from a GitHub release.
+
+        :param response: The response of the GitHub API.
+        :return: A dict with the "tag" and the "assets" of the release.
+        """
+        data = response.json()
+        return {
+            "tag": data.get("tag_name"),
+            "assets": [
+                {
+                    "name": asset.get("name", ""),
+                    "browser_download_url": asset.get("browser_download_url"),
+                    "size": asset.get("size"),
+                }
+                for asset in data.get("assets", [])
+            ],
+        }
+
+    def parse_control_headers(self, response):
+        """
+        Reads the headers of a .zsync control file, without its block checksums.
+
+        :param response: The streamed response.
+        :return: A dict with the "sha1" and the "length" of the new file.
+        :raises ValueError: If the headers are invalid.
+        """
+        content = b""
+        for chunk in response.iter_content(4096):
+            content += chunk
+            if b"\n\n" in content or len(content) > MAX_HEADER_SIZE:
+                break
+        headers, end = parse_headers(content)
+        if "SHA-1" not in headers:
+            raise ValueError("Invalid zsync file: no SHA-1")
+        return {"sha1": headers["SHA-1"].lower(), "length": headers.get("Length")}
+
+    def local_sha1(self, path):
+        """
+        Gets the SHA-1 of a local file, only hashing it again if it changed.
+        A file installed by Install is not read at all while unchanged.
+
+        :param path: The path of the file.
+        :return: The SHA-1, as a hex string.
+        """
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.hashes.get(path)
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime"] == stat.st_mtime
+        ):
+            return entry["sha1"]
+
+        sha1 = self.installed_sha1(path, stat) or file_sha1(path)
+        with self.lock:
+            self.hashes[path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha1": sha1,
+            }
+        return sha1
+
+    def installed_sha1(self, path, stat):
+        """
+        Gets the SHA-1 recorded by Install for a local file.
+
+        :param path: The path of the file.
+        :param stat: The os.stat of the file.
+        :return: The SHA-1, as a hex string, or None if it is not recorded
+            or the file changed since it was installed.
+        """
+        try:
+            with open(os.path.join(os.path.dirname(path), "source.json"), "r") as f:
+                source = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if source.get("size") != stat.st_size or source.get("mtime") != stat.st_mtime:
+            return None
+        return source.get("sha1")
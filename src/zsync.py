@@ -0,0 +1,678 @@
+import os
+import sys
+import mmap
+import pickle
+import struct
+import fnmatch
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from urllib.parse import urljoin
+import requests
+
+from downloader import GITHUB_API_URL
+from http_session import TIMEOUT, shared_session
+
+READ_SIZE = 1024 * 1024
+MERGE_BLOCKS = 8  # local runs shorter than this are fetched with their neighbours
+MIN_SPAN = 16 * 1024 * 1024  # smallest span of the local file given to a worker
+UPDATE_INFO_SECTION = b".upd_info"
+MASK32 = 0xFFFFFFFF
+
+
+def md4(data):
+    """
+    Computes the MD4 digest zsync uses for its block checksums.
+    OpenSSL 3 no longer ships MD4 by default, so there is a pure Python fallback.
+
+    :param data: The bytes to hash.
+    :return: The 16 byte digest.
+    """
+    try:
+        return hashlib.new("md4", data).digest()
+    except ValueError:
+        return _md4(data)
+
+
+def _md4(data):
+    """
+    Computes an MD4 digest as described in RFC 1320.
+    The rotations are written out, as function calls are most of the cost in Python.
+
+    :param data: The bytes to hash.
+    :return: The 16 byte digest.
+    """
+    size = len(data)
+    message = (
+        bytes(data)
+        + b"\x80"
+        + b"\0" * ((55 - size) % 64)
+        + struct.pack("<Q", (size * 8) & 0xFFFFFFFFFFFFFFFF)
+    )
+    words = struct.unpack(f"<{len(message) // 4}I", message)
+    m = MASK32
+    h0, h1, h2, h3 = 0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476
+    for base in range(0, len(words), 16):
+        x = words[base : base + 16]
+        a, b, c, d = h0, h1, h2, h3
+        for i in (0, 4, 8, 12):
+            t = (a + ((b & c) | (~b & d)) + x[i]) & m
+            a = ((t << 3) | (t >> 29)) & m
+            t = (d + ((a & b) | (~a & c)) + x[i + 1]) & m
+            d = ((t << 7) | (t >> 25)) & m
+            t = (c + ((d & a) | (~d & b)) + x[i + 2]) & m
+            c = ((t << 11) | (t >> 21)) & m
+            t = (b + ((c & d) | (~c & a)) + x[i + 3]) & m
+            b = ((t << 19) | (t >> 13)) & m
+        for i in (0, 1, 2, 3):
+            t = (a + ((b & c) | (b & d) | (c & d)) + x[i] + 0x5A827999) & m
+            a = ((t << 3) | (t >> 29)) & m
+            t = (d + ((a & b) | (a & c) | (b & c)) + x[i + 4] + 0x5A827999) & m
+            d = ((t << 5) | (t >> 27)) & m
+            t = (c + ((d & a) | (d & b) | (a & b)) + x[i + 8] + 0x5A827999) & m
+            c = ((t << 9) | (t >> 23)) & m
+            t = (b + ((c & d) | (c & a) | (d & a)) + x[i + 12] + 0x5A827999) & m
+            b = ((t << 13) | (t >> 19)) & m
+        for i in (0, 2, 1, 3):
+            t = (a + (b ^ c ^ d) + x[i] + 0x6ED9EBA1) & m
+            a = ((t << 3) | (t >> 29)) & m
+            t = (d + (a ^ b ^ c) + x[i + 8] + 0x6ED9EBA1) & m
+            d = ((t << 9) | (t >> 23)) & m
+            t = (c + (d ^ a ^ b) + x[i + 4] + 0x6ED9EBA1) & m
+            c = ((t << 11) | (t >> 21)) & m
+            t = (b + (c ^ d ^ a) + x[i + 12] + 0x6ED9EBA1) & m
+            b = ((t << 15) | (t >> 17)) & m
+        h0 = (h0 + a) & m
+        h1 = (h1 + b) & m
+        h2 = (h2 + c) & m
+        h3 = (h3 + d) & m
+    return struct.pack("<4I", h0, h1, h2, h3)
+
+
+def rsum(block):
+    """
+    Computes the zsync rolling checksum of a block.
+
+    :param block: The bytes of the block.
+    :return: The a and b halves of the checksum, each on 16 bits.
+    """
+    # b weighs each byte by its distance to the end, which is the sum of the prefix sums
+    return sum(block) & 0xFFFF, sum(accumulate(block)) & 0xFFFF
+
+
+def read_update_info(path):
+    """
+    Reads the update information embedded in the .upd_info section of an AppImage.
+
+    :param path: The path of the AppImage.
+    :return: The update information, or None if the AppImage has none.
+    :raises OSError: If the file can not be read.
+    """
+    with open(path, "rb") as f:
+        ident = f.read(16)
+        if len(ident) < 16 or ident[:4] != b"\x7fELF":
+            return None
+        is_64 = ident[4] == 2
+        endian = "<" if ident[5] == 1 else ">"
+
+        if is_64:
+            f.seek(0x28)
+            (shoff,) = struct.unpack(endian + "Q", f.read(8))
+            f.seek(0x3A)
+        else:
+            f.seek(0x20)
+            (shoff,) = struct.unpack(endian + "I", f.read(4))
+            f.seek(0x2E)
+        shentsize, shnum, shstrndx = struct.unpack(endian + "HHH", f.read(6))
+        if shoff == 0 or shnum == 0 or shstrndx >= shnum:
+            return None
+
+        f.seek(shoff)
+        table = f.read(shentsize * shnum)
+        sections = []
+        for index in range(shnum):
+            entry = table[index * shentsize : (index + 1) * shentsize]
+            if is_64:
+                name, kind, flags, addr, offset, size = struct.unpack_from(
+                    endian + "IIQQQQ", entry
+                )
+            else:
+                name, kind, flags, addr, offset, size = struct.unpack_from(
+                    endian + "IIIIII", entry
+                )
+            sections.append((name, offset, size))
+
+        names_offset, names_size = sections[shstrndx][1:]
+        f.seek(names_offset)
+        names = f.read(names_size)
+        for name, offset, size in sections:
+            end = names.find(b"\0", name)
+            if names[name:end] == UPDATE_INFO_SECTION:
+                f.seek(offset)
+                info = f.read(size).split(b"\0", 1)[0].decode("utf-8", "replace")
+                return info.strip() or None
+    return None
+
+
+def resolve_update_info(update_info, session=None):
+    """
+    Finds the url of the .zsync control file described by update information.
+
+    :param update_info: The update information, such as
+        "gh-releases-zsync|owner|repo|latest|App-*x86_64.AppImage.zsync".
+    :param session: The HTTP session, the shared one by default.
+    :return: The url of the control file.
+    :raises ValueError: If the update information is not supported.
+    :raises requests.exceptions.RequestException: If the GitHub API request failed.
+    """
+    fields = update_info.split("|")
+    if fields[0] == "zsync" and len(fields) == 2:
+        return fields[1]
+    if fields[0] != "gh-releases-zsync" or len(fields) != 5:
+        raise ValueError(f"Unsupported update information: {update_info}")
+
+    owner, repo, tag, pattern = fields[1:]
+    release = "latest" if tag == "latest" else "tags/" + tag
+    session = session or shared_session()
+    response = session.get(
+        GITHUB_API_URL.format(owner=owner, repo=repo, release=release),
+        headers={"Accept": "application/vnd.github+json"},
+        timeout=TIMEOUT,
+    )
+    response.raise_for_status()
+    url = find_asset(response.json().get("assets", []), pattern)
+    if url is None:
+        raise ValueError(f"No asset of {owner}/{repo} matches {pattern}")
+    return url
+
+
+def find_asset(assets, pattern):
+    """
+    Finds the release asset matching the pattern of gh-releases-zsync update information.
+
+    :param assets: The assets of the release, as returned by the GitHub API.
+    :param pattern: The file name pattern, such as "App-*x86_64.AppImage.zsync".
+    :return: The download url of the first matching asset, or None.
+    """
+    for asset in assets:
+        if fnmatch.fnmatch(asset.get("name", ""), pattern):
+            return asset["browser_download_url"]
+    return None
+
+
+class ZsyncControl:
+    """
+    The content of a .zsync control file: the size and SHA-1 of the new file,
+    and a rolling checksum and a truncated MD4 for each of its blocks.
+    """
+
+    def __init__(self, url, headers, checksums) -> None:
+        """
+        Initializes the ZsyncControl object.
+
+        :param url: The url of the new file.
+        :param headers: A dict with the headers of the control file.
+        :param checksums: The bytes of the block checksums.
+        :raises ValueError: If the control file is invalid.
+        """
+        self.url = url
+        try:
+            self.blocksize = int(headers["Blocksize"])
+            self.length = int(headers["Length"])
+            self.sha1 = headers["SHA-1"].lower()
+            hash_lengths = headers.get("Hash-Lengths", "1,4,16").split(",")
+            self.seq_matches, self.rsum_bytes, self.checksum_bytes = map(
+                int, hash_lengths
+            )
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Invalid zsync file: {e}")
+        self.blocks = (self.length + self.blocksize - 1) // self.blocksize
+        self.rsum_mask = (1 << (8 * self.rsum_bytes)) - 1
+
+        entry = self.rsum_bytes + self.checksum_bytes
+        if len(checksums) < self.blocks * entry:
+            raise ValueError("Truncated zsync file")
+        # The stored rsum is the last rsum_bytes of a then b, big endian
+        self.rsums = []
+        self.checksums = []
+        for index in range(self.blocks):
+            start = index * entry
+            self.rsums.append(
+                int.from_bytes(checksums[start : start + self.rsum_bytes], "big")
+            )
+            self.checksums.append(checksums[start + self.rsum_bytes : start + entry])
+
+    def key(self, a, b):
+        """
+        Turns a rolling checksum into the value stored in the control file.
+
+        :param a: The a half of the checksum.
+        :param b: The b half of the checksum.
+        :return: The truncated checksum.
+        """
+        return ((a << 16) | b) & self.rsum_mask
+
+
+def parse_control(content, url):
+    """
+    Parses a .zsync control file.
+
+    :param content: The bytes of the control file.
+    :param url: The url the control file was fetched from.
+    :return: A ZsyncControl.
+    :raises ValueError: If the control file is invalid.
+    """
+    headers, end = parse_headers(content)
+    if "URL" not in headers:
+        raise ValueError("Invalid zsync file: no URL")
+    return ZsyncControl(urljoin(url, headers["URL"]), headers, content[end:])
+
+
+def parse_headers(content):
+    """
+    Parses the text headers at the start of a .zsync control file.
+
+    :param content: The start of the control file, at least up to the empty line.
+    :return: A dict with the headers, and the position of the block checksums.
+    :raises ValueError: If the headers are not complete.
+    """
+    end = content.find(b"\n\n")
+    if end < 0:
+        raise ValueError("Invalid zsync file: no end of headers")
+    headers = {}
+    for line in content[:end].decode("utf-8", "replace").split("\n"):
+        key, separator, value = line.partition(":")
+        if separator:
+            headers[key.strip()] = value.strip()
+    return headers, end + 2
+
+
+def file_sha1(path):
+    """
+    Computes the SHA-1 of a file, which zsync uses to identify versions.
+
+    :param path: The path of the file.
+    :return: The SHA-1, as a hex string.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class ChecksumMismatch(ValueError):
+    """
+    Raised when a rebuilt file does not match the SHA-1 of its control file.
+    """
+
+
+def block_targets(control):
+    """
+    Indexes the blocks of the new file by their rolling checksum.
+
+    :param control: The ZsyncControl.
+    :return: A dict mapping each stored rsum to the numbers of its blocks.
+    """
+    targets = {}
+    for index, value in enumerate(control.rsums):
+        targets.setdefault(value, []).append(index)
+    return targets
+
+
+def scan(local, control, targets, start, end, verify=True):
+    """
+    Finds the blocks of the new file that are in the local file, at offsets
+    from start to end, with a rolling checksum over every offset confirmed by MD4.
+    After a match the scan jumps a whole block, so that unchanged runs are
+    checked block by block instead of byte by byte. Unless verify is set, the
+    block that continues a match is taken on its full 32 bit rsum alone:
+    the SHA-1 of the result catches the rare false match.
+
+    :param local: The bytes of the local file.
+    :param control: The ZsyncControl.
+    :param targets: The blocks indexed by block_targets.
+    :param start: The first offset to look at.
+    :param end: The offset after the last one to look at.
+    :param verify: True to confirm every match with MD4.
+    :return: A dict mapping block numbers to their offset in the local file.
+    """
+    blocksize = control.blocksize
+    mask = control.rsum_mask
+    rsums = control.rsums
+    checksums = control.checksums
+    checksum_bytes = control.checksum_bytes
+    trust_continuation = not verify and control.rsum_bytes == 4
+    length = len(local)
+
+    def window(offset):
+        # Like zsync, the end of the file is padded with zeros
+        return local[offset : offset + blocksize].ljust(blocksize, b"\0")
+
+    found = {}
+    expected = None  # the block that would continue the last match
+    offset = start
+    a, b = rsum(window(offset))
+    while offset < end:
+        key = ((a << 16) | b) & mask
+        indexes = targets.get(key)
+        if indexes is not None:
+            matched = None
+            if trust_continuation and expected is not None and rsums[expected] == key:
+                matched = expected
+                found.setdefault(expected, offset)
+            else:
+                checksum = md4(window(offset))[:checksum_bytes]
+                for index in indexes:
+                    if checksums[index] == checksum and next_block_matches(
+                        local, control, index, offset, window
+                    ):
+                        matched = index
+                        found.setdefault(index, offset)
+            if matched is not None:
+                expected = matched + 1 if matched + 1 < control.blocks else None
+                offset += blocksize
+                if offset < end:
+                    a, b = rsum(window(offset))
+                continue
+
+        expected = None
+        old = local[offset]
+        new = local[offset + blocksize] if offset + blocksize < length else 0
+        a = (a + new - old) & 0xFFFF
+        b = (b + a - old * blocksize) & 0xFFFF
+        offset += 1
+    return found
+
+
+def next_block_matches(local, control, index, offset, window):
+    """
+    Checks that the block after a match also matches, when the control file
+    asks for sequential matches because its checksums are short.
+
+    :param local: The bytes of the local file.
+    :param control: The ZsyncControl.
+    :param index: The number of the matched block.
+    :param offset: The offset of the match in the local file.
+    :param window: Reads the block at an offset of the local file.
+    :return: True if the match is confirmed.
+    """
+    if control.seq_matches < 2 or index + 1 >= control.blocks:
+        return True
+    next_offset = offset + control.blocksize
+    if next_offset >= len(local):
+        return False
+    block = window(next_offset)
+    if control.key(*rsum(block)) != control.rsums[index + 1]:
+        return False
+    return md4(block)[: control.checksum_bytes] == control.checksums[index + 1]
+
+
+def scan_file(path, control, start, end, verify):
+    """
+    Scans a span of a local file, see scan.
+
+    :param path: The path of the local file.
+    :param control: The ZsyncControl.
+    :param start: The first offset to look at.
+    :param end: The offset after the last one to look at.
+    :param verify: True to confirm every match with MD4.
+    :return: A dict mapping block numbers to their offset in the local file.
+    """
+    with open(path, "rb") as f:
+        local = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return scan(local, control, block_targets(control), start, end, verify)
+        finally:
+            local.close()
+
+
+class ZsyncUpdate:
+    """
+    Updates an AppImage with zsync: the new version is rebuilt from the blocks
+    of the installed file that did not change, and only the missing ranges are
+    downloaded. The result is checked against the SHA-1 of the control file
+    before it replaces the installed file.
+    """
+
+    def __init__(self, path, zsync_url=None, session=None, on_progress=None) -> None:
+        """
+        Initializes the ZsyncUpdate object.
+
+        :param path: The path of the installed AppImage.
+        :param zsync_url: The url of the control file, read from the update
+            information of the AppImage when None.
+        :param session: The HTTP session, the shared one by default.
+        :param on_progress: Called with the bytes of the new file written so far
+            and its size.
+        """
+        self.path = path
+        self.zsync_url = zsync_url
+        self.session = session or shared_session()
+        self.on_progress = on_progress
+        self.reused = 0
+        self.downloaded = 0
+
+    def fetch_control(self):
+        """
+        Fetches the control file of the latest version.
+
+        :return: A ZsyncControl.
+        :raises ValueError: If the AppImage has no usable update information.
+        :raises requests.exceptions.RequestException: If a request failed.
+        """
+        if self.zsync_url is None:
+            update_info = read_update_info(self.path)
+            if update_info is None:
+                raise ValueError(f"{self.path} has no update information")
+            self.zsync_url = resolve_update_info(update_info, self.session)
+        response = self.session.get(self.zsync_url, timeout=TIMEOUT)
+        response.raise_for_status()
+        return parse_control(response.content, self.zsync_url)
+
+    def run(self, control=None, local_sha1=None):
+        """
+        Updates the AppImage if a newer version is available.
+
+        :param control: The ZsyncControl, fetched when None.
+        :param local_sha1: The SHA-1 of the installed file, if already known.
+        :return: False if the AppImage was already up to date, True if it was updated.
+        :raises ValueError: If the update information or the result is invalid.
+        :raises requests.exceptions.RequestException: If a request failed.
+        :raises OSError: If the files could not be read or written.
+        :raises subprocess.CalledProcessError: If the scan of the local file failed.
+        """
+        if control is None:
+            control = self.fetch_control()
+        if (local_sha1 or file_sha1(self.path)) == control.sha1:
+            return False
+
+        tmp_path = self.path + ".zs-part"
+        try:
+            try:
+                self.build(control, self.match_blocks(control), tmp_path)
+            except ChecksumMismatch:
+                # A block taken on its rsum alone was wrong, start over verified
+                self.reused = 0
+                self.downloaded = 0
+                self.build(control, self.match_blocks(control, verify=True), tmp_path)
+            os.chmod(tmp_path, os.stat(self.path).st_mode & 0o7777)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return True
+
+    def match_blocks(self, control, verify=False):
+        """
+        Finds the blocks of the new file that are already in the local file.
+        The scan is pure Python and CPU bound, so it runs in worker processes,
+        one span of the file each, and not in the process of the user interface.
+
+        :param control: The ZsyncControl.
+        :param verify: True to confirm every match with MD4, see scan.
+        :return: A dict mapping block numbers to their offset in the local file.
+        :raises subprocess.CalledProcessError: If a worker failed.
+        """
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return {}
+        workers = max(1, min(os.cpu_count() or 1, size // MIN_SPAN))
+        span = -(-size // workers)
+        spans = [(start, min(start + span, size)) for start in range(0, size, span)]
+        payload = pickle.dumps(control)
+        with ThreadPoolExecutor(max_workers=len(spans)) as executor:
+            parts = list(
+                executor.map(
+                    lambda bounds: self.scan_process(payload, *bounds, verify), spans
+                )
+            )
+
+        found = {}
+        for part in parts:
+            for index, offset in part.items():
+                found.setdefault(index, offset)
+        return found
+
+    def scan_process(self, payload, start, end, verify):
+        """
+        Scans a span of the local file in a worker process, running this module.
+
+        :param payload: The pickled ZsyncControl.
+        :param start: The first offset to look at.
+        :param end: The offset after the last one to look at.
+        :param verify: True to confirm every match with MD4.
+        :return: A dict mapping block numbers to their offset in the local file.
+        :raises subprocess.CalledProcessError: If the worker failed.
+        """
+        result = subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                self.path,
+                str(start),
+                str(end),
+                "verify" if verify else "trust",
+            ],
+            input=payload,
+            capture_output=True,
+            check=True,
+        )
+        return pickle.loads(result.stdout)
+
+    def plan(self, control, found):
+        """
+        Splits the new file into runs of blocks copied from the local file
+        and runs of blocks to download. Short local runs between two downloads
+        are downloaded too, to save a request.
+
+        :param control: The ZsyncControl.
+        :param found: The blocks found in the local file.
+        :return: A list of (first block, end block, local) tuples.
+        """
+        runs = []
+        for index in range(control.blocks):
+            is_local = index in found
+            if runs and runs[-1][2] == is_local:
+                runs[-1][1] = index + 1
+            else:
+                runs.append([index, index + 1, is_local])
+
+        merged = []
+        for position, run in enumerate(runs):
+            start, end, is_local = run
+            if is_local and 0 < position < len(runs) - 1 and end - start < MERGE_BLOCKS:
+                is_local = False
+            if merged and not is_local and not merged[-1][2]:
+                merged[-1][1] = end
+            else:
+                merged.append([start, end, is_local])
+        return [tuple(run) for run in merged]
+
+    def build(self, control, found, tmp_path):
+        """
+        Writes the new file in order, hashing it as it is written.
+
+        :param control: The ZsyncControl.
+        :param found: The blocks found in the local file.
+        :param tmp_path: The path of the new file.
+        :raises ChecksumMismatch: If the result does not match the control file.
+        """
+        blocksize = control.blocksize
+        sha1 = hashlib.sha1()
+        written = 0
+        with open(self.path, "rb") as local, open(tmp_path, "wb") as out:
+            for start, end, is_local in self.plan(control, found):
+                first = start * blocksize
+                last = min(end * blocksize, control.length)
+                if is_local:
+                    for index in range(start, end):
+                        size = min(blocksize, control.length - index * blocksize)
+                        block = os.pread(local.fileno(), size, found[index])
+                        block = block.ljust(size, b"\0")
+                        out.write(block)
+                        sha1.update(block)
+                        self.reused += size
+                else:
+                    for chunk in self.fetch_range(control.url, first, last):
+                        out.write(chunk)
+                        sha1.update(chunk)
+                        self.downloaded += len(chunk)
+                written = last
+                if self.on_progress is not None:
+                    self.on_progress(written, control.length)
+
+        if sha1.hexdigest() != control.sha1:
+            raise ChecksumMismatch("The updated file does not match the zsync checksum")
+
+    def fetch_range(self, url, start, end):
+        """
+        Downloads a range of the new file.
+
+        :param url: The url of the new file.
+        :param start: The first byte of the range.
+        :param end: The byte after the range.
+        :return: A generator of the chunks of the range.
+        :raises ValueError: If the server does not send the range.
+        """
+        response = self.session.get(
+            url,
+            headers={"Range": f"bytes={start}-{end - 1}"},
+            timeout=TIMEOUT,
+            stream=True,
+        )
+        with response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise ValueError("The server does not support range requests")
+            received = 0
+            for chunk in response.iter_content(READ_SIZE):
+                chunk = chunk[: end - start - received]
+                received += len(chunk)
+                yield chunk
+            if received != end - start:
+                raise requests.exceptions.ConnectionError(f"{url} ended early")
+
+
+def main(argv):
+    """
+    Runs the scan of a span of a local file for ZsyncUpdate.match_blocks.
+    The pickled ZsyncControl is read from stdin, the pickled result written to stdout.
+
+    :param argv: The path of the local file, the span and "verify" or "trust".
+    :return: The exit status.
+    """
+    path, start, end, mode = argv
+    output = sys.stdout.buffer
+    # Nothing printed by the imported modules may end up in the result
+    sys.stdout = sys.stderr
+    control = pickle.load(sys.stdin.buffer)
+    found = scan_file(path, control, int(start), int(end), mode == "verify")
+    pickle.dump(found, output)
+    output.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,66 @@
+import io
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """
+    Serves a directory, answering single Range requests with a 206.
+    An If-Range that does not match the Last-Modified of the file gets the
+    whole file, as the server would send once the file changed.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        header = self.headers.get("Range")
+        path = self.translate_path(self.path)
+        if header is None or not self.server.ranges_supported:
+            return super().send_head()
+        if not os.path.isfile(path):
+            return super().send_head()
+        last_modified = self.date_time_string(int(os.path.getmtime(path)))
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range != last_modified:
+            del self.headers["Range"]
+            return super().send_head()
+
+        start, end = (int(value) for value in header.split("=")[1].split("-"))
+        with open(path, "rb") as f:
+            f.seek(start)
+            body = f.read(end + 1 - start)
+        self.server.ranges.append((start, end))
+        self.send_response(206)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header(
+            "Content-Range", f"bytes {start}-{end}/{os.path.getsize(path)}"
+        )
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        return io.BytesIO(body)
+
+
+class RangeServer(ThreadingHTTPServer):
+    """
+    A local HTTP server for the tests, recording the ranges it was asked for.
+    """
+
+    def __init__(self, directory, ranges_supported=True) -> None:
+        self.ranges = []
+        self.ranges_supported = ranges_supported
+        super().__init__(("127.0.0.1", 0), partial(RangeHandler, directory=directory))
+
+    def start(self, test):
+        """
+        Serves in a background thread until the end of a test.
+
+        :param test: The TestCase.
+        :return: The base url of the server.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        test.addCleanup(self.server_close)
+        test.addCleanup(self.shutdown)
+        return f"http://127.0.0.1:{self.server_address[1]}/"
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import hashlib
+import random
+import tempfile
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from downloader import Download  # noqa: E402
+from range_server import RangeServer  # noqa: E402
+
+SIZE = 4 * 1024 * 1024
+SEGMENT_SIZE = 256 * 1024
+
+
+class StopAfter:
+    """
+    A cancel token that cancels the download once enough bytes were written.
+    """
+
+    def __init__(self, limit) -> None:
+        self.limit = limit
+        self.download = None
+
+    def is_cancelled(self):
+        return self.download.done >= self.limit
+
+
+class TestDownload(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.data = random.Random(1).randbytes(SIZE)
+        self.served = os.path.join(self.tmp.name, "App.AppImage")
+        with open(self.served, "wb") as f:
+            f.write(self.data)
+        self.path = os.path.join(self.tmp.name, "download.part")
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+
+    def serve(self, ranges_supported=True):
+        self.server = RangeServer(self.tmp.name, ranges_supported)
+        return self.server.start(self) + "App.AppImage"
+
+    def download(self, url, token=None):
+        download = Download(
+            url,
+            self.path,
+            session=self.session,
+            segments=4,
+            min_segment_size=SEGMENT_SIZE,
+            token=token,
+        )
+        if token is not None:
+            token.download = download
+        return download
+
+    def read_download(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def sha1(self, start=0, end=SIZE):
+        return hashlib.sha1(self.data[start:end]).hexdigest()
+
+    def test_segmented(self):
+        download = self.download(self.serve())
+        self.assertTrue(download.run())
+        self.assertEqual(self.read_download(), self.data)
+        # Each segment is hashed as it is written, the whole file is not
+        self.assertIsNone(download.sha1)
+        self.assertEqual(len(download.segment_sha1s), 4)
+        for start, end, sha1 in download.segment_sha1s:
+            self.assertEqual(sha1, self.sha1(start, end))
+        self.assertFalse(os.path.exists(self.path + ".state"))
+        # The probe, then one range per segment
+        segments = sorted(self.server.ranges)[1:]
+        self.assertEqual(len(segments), 4)
+        self.assertEqual(segments[0][0], 0)
+        self.assertEqual(segments[-1][1], SIZE - 1)
+        for previous, following in zip(segments, segments[1:]):
+            self.assertEqual(previous[1] + 1, following[0])
+
+    def test_resume_after_cancel(self):
+        url = self.serve()
+        self.assertFalse(self.download(url, StopAfter(SIZE // 2)).run())
+        with open(self.path + ".state") as f:
+            state = json.load(f)
+        missing = sorted(
+            (position, end - 1)
+            for start, end, position in state["segments"]
+            if position < end
+        )
+        self.assertTrue(missing)
+        self.assertLess(sum(end + 1 - start for start, end in missing), SIZE)
+
+        self.server.ranges.clear()
+        download = self.download(url)
+        self.assertTrue(download.run())
+        self.assertEqual(self.read_download(), self.data)
+        self.assertEqual(sorted(self.server.ranges), missing)
+        # Segments started by the first run are not read back to be hashed
+        for start, end, sha1 in download.segment_sha1s:
+            fresh = [start, end, start] in state["segments"]
+            self.assertEqual(sha1, self.sha1(start, end) if fresh else None)
+        self.assertFalse(os.path.exists(self.path + ".state"))
+
+    def test_restart_when_the_source_changed(self):
+        url = self.serve()
+        self.assertFalse(self.download(url, StopAfter(SIZE // 2)).run())
+        changed = random.Random(2).randbytes(SIZE)
+        with open(self.served, "wb") as f:
+            f.write(changed)
+        stat = os.stat(self.served)
+        os.utime(self.served, (stat.st_atime, stat.st_mtime + 10))
+
+        self.assertTrue(self.download(url).run())
+        self.assertEqual(self.read_download(), changed)
+
+    def test_without_range_support(self):
+        download = self.download(self.serve(ranges_supported=False))
+        self.assertTrue(download.run())
+        self.assertEqual(self.read_download(), self.data)
+        self.assertEqual(download.sha1, self.sha1())
+        self.assertEqual(self.server.ranges, [])
+        self.assertFalse(os.path.exists(self.path + ".state"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import sys
+import random
+import struct
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import zsync  # noqa: E402
+from range_server import RangeServer  # noqa: E402
+
+BLOCKSIZE = 2048
+
+
+def make_control(data, url, blocksize=BLOCKSIZE, hash_lengths=(2, 3, 5)):
+    """
+    Writes a .zsync control file the way zsyncmake does.
+
+    :param data: The bytes of the new file.
+    :param url: The url of the new file.
+    :param blocksize: The block size.
+    :param hash_lengths: The sequential matches, rsum bytes and checksum bytes.
+    :return: The bytes of the control file.
+    """
+    seq_matches, rsum_bytes, checksum_bytes = hash_lengths
+    content = bytearray(
+        (
+            "zsync: 0.6.2\n"
+            "Filename: App.AppImage\n"
+            f"Blocksize: {blocksize}\n"
+            f"Length: {len(data)}\n"
+            f"Hash-Lengths: {seq_matches},{rsum_bytes},{checksum_bytes}\n"
+            f"URL: {url}\n"
+            f"SHA-1: {hashlib.sha1(data).hexdigest()}\n\n"
+        ).encode()
+    )
+    for offset in range(0, len(data), blocksize):
+        block = data[offset : offset + blocksize].ljust(blocksize, b"\0")
+        a, b = zsync.rsum(block)
+        content += struct.pack(">HH", a, b)[4 - rsum_bytes :]
+        content += zsync.md4(block)[:checksum_bytes]
+    return bytes(content)
+
+
+class TestMd4(unittest.TestCase):
+    def test_rfc_1320_vectors(self):
+        vectors = {
+            b"": "31d6cfe0d16ae931b73c59d7e0c089c0",
+            b"abc": "a448017aaf21d8525fc10ae87aa6729d",
+            b"message digest": "d9130a8164549fe818874806e1c7014b",
+            b"1234567890" * 8: "e33b4ddc9c38f2199c3e7b164fcc0536",
+        }
+        for data, digest in vectors.items():
+            self.assertEqual(zsync._md4(data).hex(), digest)
+
+
+class TestZsyncUpdate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.server = RangeServer(self.tmp.name)
+        self.base_url = self.server.start(self)
+
+        rng = random.Random(1)
+        self.old = rng.randbytes(200_000)
+        new = bytearray(self.old)
+        new[10_000:10_000] = rng.randbytes(777)  # shifts everything after it
+        new[100_000:100_100] = rng.randbytes(100)
+        del new[150_000:153_000]
+        new += rng.randbytes(1234)
+        self.new = bytes(new)
+
+        self.local = os.path.join(self.tmp.name, "local.AppImage")
+        with open(self.local, "wb") as f:
+            f.write(self.old)
+        os.chmod(self.local, 0o755)
+
+    def publish(self, data, hash_lengths=(2, 3, 5)):
+        with open(os.path.join(self.tmp.name, "App.AppImage"), "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.tmp.name, "App.AppImage.zsync"), "wb") as f:
+            f.write(make_control(data, "App.AppImage", hash_lengths=hash_lengths))
+        return self.base_url + "App.AppImage.zsync"
+
+    def read_local(self):
+        with open(self.local, "rb") as f:
+            return f.read()
+
+    def test_rebuilds_from_local_blocks(self):
+        update = zsync.ZsyncUpdate(self.local, self.publish(self.new))
+        self.assertTrue(update.run())
+        self.assertEqual(self.read_local(), self.new)
+        self.assertEqual(os.stat(self.local).st_mode & 0o777, 0o755)
+        self.assertFalse(os.path.exists(self.local + ".zs-part"))
+        # Only the blocks around the three edits and the tail are downloaded
+        self.assertLess(update.downloaded, 12 * BLOCKSIZE)
+        self.assertEqual(update.reused + update.downloaded, len(self.new))
+        self.assertTrue(self.server.ranges)
+
+    def test_full_rsums(self):
+        url = self.publish(self.new, hash_lengths=(1, 4, 16))
+        update = zsync.ZsyncUpdate(self.local, url)
+        self.assertTrue(update.run())
+        self.assertEqual(self.read_local(), self.new)
+        self.assertLess(update.downloaded, 12 * BLOCKSIZE)
+
+    def test_verified_scan_matches(self):
+        control = zsync.parse_control(
+            make_control(self.new, "App.AppImage"), self.base_url
+        )
+        update = zsync.ZsyncUpdate(self.local)
+        self.assertEqual(
+            update.match_blocks(control),
+            update.match_blocks(control, verify=True),
+        )
+
+    def test_up_to_date(self):
+        update = zsync.ZsyncUpdate(self.local, self.publish(self.old))
+        self.assertFalse(update.run())
+        self.assertEqual(self.server.ranges, [])
+
+    def test_checksum_mismatch_keeps_local_file(self):
+        url = self.publish(self.new)
+        # The server now sends other bytes than the control file describes
+        with open(os.path.join(self.tmp.name, "App.AppImage"), "wb") as f:
+            f.write(bytes(len(self.new)))
+        with self.assertRaises(zsync.ChecksumMismatch):
+            zsync.ZsyncUpdate(self.local, url).run()
+        self.assertEqual(self.read_local(), self.old)
+        self.assertFalse(os.path.exists(self.local + ".zs-part"))
+
+    def test_no_update_information(self):
+        self.assertIsNone(zsync.read_update_info(self.local))
+        with self.assertRaises(ValueError):
+            zsync.ZsyncUpdate(self.local).run()
+
+
+if __name__ == "__main__":
+    unittest.main()